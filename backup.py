@@ -0,0 +1,82 @@
+import os
+import re
+import itertools
+import sqlite3
+
+import settings
+
+from datetime import datetime
+from contextlib import closing
+
+
+SNAPSHOT_PREFIX = 'logger-'
+SNAPSHOT_FORMAT = '%Y%m%d-%H%M%S'
+SNAPSHOT_PATTERN = re.compile(r'logger-(\d{8}-\d{6})(?:-(\d+))?\.db')
+
+
+class Backup:
+    def __init__(self, directory, keep):
+        self.db_path = settings.db_path()
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.keep = keep
+        self.busy_timeout = settings.STORAGE_PROFILES[settings.STORAGE_PROFILE]['busy_timeout']
+
+    def _copy(self, path):
+        with closing(sqlite3.connect(self.db_path, isolation_level=None)) as source, closing(sqlite3.connect(path)) as target:
+            source.execute(f'PRAGMA busy_timeout = {self.busy_timeout}')
+
+            # a read transaction held across the steps pins one WAL snapshot: writers keep committing
+            # while pages are copied, and the copy doesn't restart every time one does
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master')
+            try:
+                source.backup(target, pages=settings.BACKUP_STEP_PAGES)
+            finally:
+                source.execute('COMMIT')
+
+            # the copy carries the source's WAL flag, a snapshot should be one self-contained file
+            target.execute('PRAGMA journal_mode = DELETE')
+            return target.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+
+    def _reserve(self, stamp):
+        # names have one second resolution, a second snapshot within it takes the next counter
+        # rather than replacing the first
+        for count in itertools.count():
+            path = os.path.join(self.directory, f'{SNAPSHOT_PREFIX}{stamp}{f"-{count}" if count else ""}.db')
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return path
+            except FileExistsError:
+                pass
+
+    def snapshot(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+        stamp = datetime.now().strftime(SNAPSHOT_FORMAT)
+        path_tmp = os.path.join(self.directory, f'{SNAPSHOT_PREFIX}{stamp}.{os.getpid()}.tmp')
+
+        try:
+            if not self._copy(path_tmp):
+                os.remove(path_tmp)
+                return None
+        except:
+            if os.path.exists(path_tmp):
+                os.remove(path_tmp)
+            raise
+
+        path = self._reserve(stamp)
+        os.replace(path_tmp, path)
+        return path
+
+    def snapshots(self):
+        matches = (SNAPSHOT_PATTERN.fullmatch(name) for name in os.listdir(self.directory))
+        names = sorted((match[1], int(match[2] or 0), match[0]) for match in matches if match)
+        return [os.path.join(self.directory, name) for _, _, name in names]
+
+    def rotate(self):
+        removed = self.snapshots()[:-self.keep]
+
+        for path in removed:
+            os.remove(path)
+
+        return removed
@@ -0,0 +1,113 @@
+import os
+import sys
+import random
+import argparse
+
+from itertools import islice
+from datetime import date, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import settings
+
+
+WORDS = [
+    'river', 'silent', 'garden', 'winter', 'empire', 'shadow', 'glass', 'ocean', 'stone', 'letters',
+    'night', 'machine', 'history', 'island', 'fire', 'memory', 'north', 'city', 'summer', 'kingdom',
+    'light', 'house', 'war', 'peace', 'journey', 'secret', 'mountain', 'forest', 'dream', 'road',
+]
+FIRST_NAMES = ['Anna', 'Jorge', 'Mei', 'Tomas', 'Ines', 'Olu', 'Sanna', 'Ravi', 'Clara', 'Hiro']
+LAST_NAMES = ['Novak', 'Silva', 'Chen', 'Moreau', 'Okafor', 'Lindqvist', 'Iyer', 'Kowalski', 'Sato', 'Weber']
+
+DATE_START = date(2000, 1, 1)
+DAY_START = 6 * 60
+DAY_END = 23 * 60
+CHUNK_SIZE = 50000
+
+
+def generate_books(rng, count):
+    id_min, id_max = settings.BOOK_ID_RANGE
+
+    for book_id in range(id_min, min(id_min + count, id_max + 1)):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).capitalize()
+        author = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        yield {'id': book_id, 'title': title, 'author': author}
+
+
+def generate_logs(rng, book_ids, count, per_day):
+    pages = dict.fromkeys(book_ids, 1)
+    book_id = rng.choice(book_ids)
+    day = DATE_START
+
+    while count:
+        minute = DAY_START + rng.randrange(120)
+
+        for _ in range(min(count, rng.randint(1, per_day * 2 - 1))):
+            duration = rng.randint(15, 120)
+            if minute + duration >= DAY_END:
+                break
+
+            if rng.random() < 0.2:
+                book_id = rng.choice(book_ids)
+
+            page_start = pages[book_id]
+            page_end = page_start + max(duration // 2 + rng.randint(-5, 5), 1)
+            pages[book_id] = page_end
+            has_pages = rng.random() > 0.1
+
+            yield {
+                'book_id': book_id,
+                'date': day,
+                'time_start': time(minute // 60, minute % 60),
+                'time_end': time((minute + duration) // 60, (minute + duration) % 60),
+                'page_start': page_start if has_pages else None,
+                'page_end': page_end if has_pages else None,
+                'depth': rng.randint(1, 5) if rng.random() > 0.3 else None,
+            }
+
+            count -= 1
+            minute += duration + rng.randint(5, 180)
+
+        day += timedelta(days=rng.choice([1, 1, 1, 2]))
+
+
+def generate(path, log_count, book_count=None, per_day=3, seed=0):
+    if os.path.exists(path):
+        raise FileExistsError(path)
+
+    settings.DB_PATH = path
+    from db import DB
+
+    rng = random.Random(seed)
+    db = DB()
+
+    if book_count is None:
+        book_count = min(max(log_count // 100, 1), 1000)
+
+    books = list(generate_books(rng, book_count))
+    logs = generate_logs(rng, [book['id'] for book in books], log_count, per_day)
+
+    with db.storage_profile('bulk'):
+        db.insert_items(books=books)
+
+        for chunk in iter(lambda: list(islice(logs, CHUNK_SIZE)), []):
+            db.insert_items(logs=chunk)
+
+    return len(books)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill a new Logger DB with synthetic books and logs.')
+    parser.add_argument('path')
+    parser.add_argument('--logs', type=int, default=1000)
+    parser.add_argument('--books', type=int)
+    parser.add_argument('--per-day', type=int, default=3, help='average reading sessions per day')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    book_count = generate(os.path.abspath(args.path), args.logs, args.books, args.per_day, args.seed)
+    print(f'{book_count} books, {args.logs} logs')
+
+
+if __name__ == '__main__':
+    main()
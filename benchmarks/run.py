@@ -0,0 +1,218 @@
+import os
+import sys
+import pty
+import json
+import time
+import logging
+import argparse
+import platform
+import sqlite3
+import builtins
+import tempfile
+import statistics
+import subprocess
+
+from datetime import timedelta
+from contextlib import redirect_stdout
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+LOGGER = os.path.join(ROOT_DIR, 'logger.py')
+
+sys.path.insert(0, ROOT_DIR)
+
+import settings
+
+
+SCALES = [1000, 10000, 100000, 1000000]
+TERMINAL_SIZE = os.terminal_size((80, 24))
+
+# logger.py with the render cache pointed at a given dir, or off when it's empty
+RUN_LOGGER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import settings
+settings.ENABLE_CACHE, settings.CACHE_DIR = bool(sys.argv[2]), sys.argv[2]
+sys.argv = ['logger.py'] + sys.argv[3:]
+import logger
+logger.main()
+"""
+
+
+def summarize(times):
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'runs': len(times),
+    }
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    try:
+        function(*args)
+    except SystemExit:
+        pass
+    return time.perf_counter() - start
+
+
+def run_in_pty(argv, cwd):
+    master, slave = pty.openpty()
+    start = time.perf_counter()
+    process = subprocess.Popen(argv, cwd=cwd, stdin=slave, stdout=slave, stderr=slave)
+    os.close(slave)
+
+    try:
+        while os.read(master, 65536):
+            pass
+    except OSError:
+        pass
+
+    process.wait()
+    os.close(master)
+    return time.perf_counter() - start
+
+
+def bench_process(path, repeat):
+    # Printer sizes itself from the terminal; pin it so runs are comparable
+    os.get_terminal_size = lambda *args: TERMINAL_SIZE
+    builtins.input = lambda *args: 'y'
+    logging.disable(logging.CRITICAL)
+
+    settings.DB_PATH = path
+
+    from sqlalchemy import select, func
+    from db import DB, Log
+    from printer import Printer
+    from logger import Add, Remove, Show, Search
+
+    db = DB()
+    printer = Printer()
+
+    book_id = db.get_all_books()[0].id
+    word = db.book_obj(book_id).title.split()[0]
+    date_next = (db.session.scalar(select(func.max(Log.date))) + timedelta(days=1)).isoformat()
+    logs = list(db.iter_logs())
+
+    cases = {name: [] for name in ('show', 'show_book', 'search', 'add_book', 'remove_book', 'add_log', 'remove_log', 'print_table_log')}
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for _ in range(repeat):
+            cases['show'].append(timed(Show(db, printer).run, []))
+            cases['show_book'].append(timed(Show(db, printer).run, [str(book_id)]))
+            cases['search'].append(timed(Search(db, printer).run, [word]))
+
+            cases['add_book'].append(timed(Add(db, printer).run, ['book', 'Benchmark', 'Benchmark']))
+            new_id = max(book.id for book in db.search('Benchmark'))
+            cases['remove_book'].append(timed(Remove(db, printer).run, [str(new_id)]))
+
+            cases['add_log'].append(timed(Add(db, printer).run, ['log', str(book_id), date_next, '08:00-09:00']))
+            cases['remove_log'].append(timed(Remove(db, printer).run, [f'{date_next}.08:00']))
+
+            cases['print_table_log'].append(timed(printer.print_table_log, list(logs)))
+
+    return {name: summarize(times) for name, times in cases.items()}
+
+
+def bench_cold_start(cwd, repeat):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        uncached, cached = [sys.executable, '-c', RUN_LOGGER, ROOT_DIR, ''], [sys.executable, '-c', RUN_LOGGER, ROOT_DIR, cache_dir]
+        commands = {
+            'cold_start': [sys.executable, LOGGER],
+            'cold_start_show': uncached + ['show'],
+            'cold_start_show_cached': cached + ['show'],
+        }
+
+        # the first cached run renders, every timed one replays
+        run_in_pty(commands['cold_start_show_cached'], cwd)
+
+        return {name: summarize([run_in_pty(argv, cwd) for _ in range(repeat)]) for name, argv in commands.items()}
+
+
+def prepare(data_dir, scale, seed):
+    cwd = os.path.join(data_dir, str(scale))
+    path = os.path.join(cwd, '.logger.db')
+
+    if not os.path.exists(path):
+        os.makedirs(cwd, exist_ok=True)
+        print(f'Generating {scale} logs', file=sys.stderr)
+        subprocess.run([sys.executable, os.path.join(BENCHMARKS_DIR, 'generate.py'), path, '--logs', str(scale), '--seed', str(seed)], check=True, stdout=subprocess.DEVNULL)
+
+    return cwd, path
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales, repeat, data_dir, seed):
+    results = []
+
+    for scale in scales:
+        cwd, path = prepare(data_dir, scale, seed)
+        print(f'Running {scale} logs', file=sys.stderr)
+
+        # each scale point gets a fresh process so engines and caches don't leak between DBs
+        worker = subprocess.run([sys.executable, __file__, '--worker', path, '--repeat', str(repeat)], capture_output=True, text=True, check=True)
+        cases = json.loads(worker.stdout)
+        cases.update(bench_cold_start(cwd, repeat))
+
+        results.extend({'logs': scale, 'case': name, **timing} for name, timing in cases.items())
+
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'seed': seed,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(path_old, path_new):
+    with open(path_old) as f:
+        old = {(r['logs'], r['case']): r for r in json.load(f)['results']}
+    with open(path_new) as f:
+        new = {(r['logs'], r['case']): r for r in json.load(f)['results']}
+
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key]['median'], new[key]['median']
+        print(f'{key[0]:>8} {key[1]:<16} {before * 1000:>10.2f}ms {after * 1000:>10.2f}ms {after / before:>7.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time Logger commands against synthetic DBs.')
+    parser.add_argument('--scales', default=','.join(map(str, SCALES)), help='comma separated log counts')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', default=os.path.join(BENCHMARKS_DIR, 'data'), help='where generated DBs are kept')
+    parser.add_argument('--output', help='write results as JSON to this file instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.worker:
+        json.dump(bench_process(args.worker, args.repeat), sys.stdout)
+        return
+
+    scales = [int(scale) for scale in args.scales.split(',')]
+    results = run(scales, args.repeat, os.path.abspath(args.data), args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
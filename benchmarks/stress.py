@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing
+
+from datetime import date, time as day_time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import settings
+
+
+DATE_START = date(2000, 1, 1)
+SLOTS_PER_DAY = 1000
+
+
+def log_slot(slot):
+    day, minute = divmod(slot, SLOTS_PER_DAY)
+    return DATE_START + timedelta(days=day), day_time(minute // 60, minute % 60), day_time((minute + 1) // 60, (minute + 1) % 60)
+
+
+def writer(path, index, log_count, book_count, start):
+    settings.DB_PATH = path
+    from db import DB
+
+    db = DB()
+    book_ids = []
+    start.wait()
+
+    for i in range(book_count):
+        book_ids.append(db.insert_book(title=f'Writer {index} book {i}', author=f'Writer {index}'))
+
+    for i in range(log_count):
+        log_date, time_start, time_end = log_slot(index * log_count + i)
+        db.insert_log(book_id=book_ids[i % len(book_ids)], date=log_date, time_start=time_start, time_end=time_end, page_start=i, page_end=i + 1)
+
+
+def stress(path, writers, log_count, book_count):
+    settings.DB_PATH = path
+    import db
+
+    db.engine.dispose()
+
+    start = multiprocessing.Barrier(writers + 1)
+    processes = [multiprocessing.Process(target=writer, args=(path, index, log_count, book_count, start)) for index in range(writers)]
+
+    for process in processes:
+        process.start()
+
+    start.wait()
+    started = time.perf_counter()
+
+    for process in processes:
+        process.join()
+
+    elapsed = time.perf_counter() - started
+
+    with sqlite3.connect(path) as conn:
+        books = conn.execute('SELECT COUNT(*) FROM book').fetchone()[0]
+        logs = conn.execute('SELECT COUNT(*) FROM log').fetchone()[0]
+        stats = conn.execute('SELECT COALESCE(SUM(log_count), 0) FROM book_stats').fetchone()[0]
+
+    failed = sum(process.exitcode != 0 for process in processes)
+    writes = books + logs
+
+    print(f'{writers} writers, {elapsed:.2f}s, {writes / elapsed:.0f} writes/s')
+    print(f'books {books}/{writers * book_count}, logs {logs}/{writers * log_count}, book_stats {stats}, failed writers {failed}')
+
+    return failed == 0 and books == writers * book_count and logs == stats == writers * log_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run concurrent writer processes against one Logger DB and check no writes are lost.')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--logs', type=int, default=200, help='logs per writer')
+    parser.add_argument('--books', type=int, default=5, help='books per writer')
+    parser.add_argument('--path', help='DB to write to, a new temporary one by default')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.abspath(args.path) if args.path else os.path.join(directory, 'stress.db')
+        ok = stress(path, args.writers, args.logs, args.books)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+
+import settings
+
+from contextlib import contextmanager, closing
+
+
+SOURCES = ['logger.py', 'printer.py', 'db.py', 'settings.py']
+
+
+class RenderCache:
+    def __init__(self, printer, args):
+        self.printer = printer
+        self.db_path = settings.db_path()
+        self.path = os.path.join(os.path.expanduser(settings.CACHE_DIR), self._key(args))
+        self.version = self._read_version()
+
+    def _key(self, args):
+        root = os.path.dirname(os.path.abspath(__file__))
+        sources = [os.stat(os.path.join(root, source)).st_mtime_ns for source in SOURCES]
+        key = [self.db_path, args, self.printer.width, self.printer.columns, self.printer.format, sources]
+        return hashlib.sha1(json.dumps(key).encode()).hexdigest()
+
+    def _read_version(self):
+        try:
+            # the counter starts over in every DB, so the file's identity goes with it: a DB replaced
+            # or recreated at the same path gets a new inode, one copied over it a new ctime
+            stat = os.stat(self.db_path)
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        except (OSError, sqlite3.Error, TypeError):
+            return None
+
+        return f'{version}.{stat.st_ino}.{stat.st_ctime_ns}'
+
+    def _prune(self):
+        # entries are keyed on source mtimes too, so old ones are never hit again; the least
+        # recently used go once the directory is over its limit
+        directory = os.path.dirname(self.path)
+        entries = []
+
+        for name in os.listdir(directory):
+            try:
+                entries.append((os.stat(os.path.join(directory, name)).st_mtime_ns, name))
+            except OSError:
+                pass
+
+        for _, name in sorted(entries)[:-settings.CACHE_MAX_ENTRIES or None]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def replay(self):
+        if self.version is None:
+            return False
+
+        try:
+            with open(self.path) as f:
+                version, output = f.read().split('\n', 1)
+        except (OSError, ValueError):
+            return False
+
+        if version != self.version:
+            return False
+
+        try:
+            os.utime(self.path)
+        except OSError:
+            pass
+
+        sys.stdout.write(output)
+        return True
+
+    @contextmanager
+    def record(self):
+        self.printer.capture = []
+        yield
+        output, self.printer.capture = self.printer.capture, None
+
+        if self.version is None or output is None:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(f'{self.path}.{os.getpid()}.tmp', 'w') as f:
+                f.write(f'{self.version}\n' + ''.join(output))
+            os.replace(f'{self.path}.{os.getpid()}.tmp', self.path)
+            self._prune()
+        except OSError:
+            pass
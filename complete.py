@@ -0,0 +1,229 @@
+import os
+import sys
+import shlex
+import sqlite3
+
+import settings
+
+
+ARGUMENTS = {
+    'show': ['book'],
+    'edit': ['book', 'title', 'author'],
+    'completion': ['shell'],
+}
+REPEATED_ARGUMENTS = {
+    'remove': 'item',
+}
+SHELLS = ['bash', 'zsh']
+
+# log IDs are completed a level at a time (year, month, day, then time), so a large history
+# never dumps every log at once; each level is one index seek per distinct value
+LOG_ID_LEVELS = [(4, '-'), (7, '-'), (10, '.')]
+BOOK_LIMIT = 100
+
+
+BASH_SCRIPT = r'''_logger() {{
+    local line=${{COMP_LINE:0:COMP_POINT}} candidate
+    local word=${{line##*[[:space:]]}}
+    COMPREPLY=()
+
+    while IFS=$'\t' read -r candidate _; do
+        [[ $candidate == *' '* ]] && printf -v candidate '%q' "$candidate"
+        COMPREPLY+=("$candidate")
+    done < <({complete} "$line" {commands} 2>/dev/null)
+
+    # bash splits words on ':', so log IDs are completed relative to the last one
+    if [[ $word == *:* && $COMP_WORDBREAKS == *:* ]]; then
+        COMPREPLY=("${{COMPREPLY[@]#"${{word%"${{word##*:}}"}}"}}")
+    fi
+
+    if [[ ${{#COMPREPLY[@]}} -eq 1 && ${{COMPREPLY[0]}} == *[-.] ]]; then
+        compopt -o nospace
+    fi
+}}
+complete -F _logger logger.py logger
+'''
+
+ZSH_SCRIPT = r'''#compdef logger.py logger
+
+_logger() {{
+    local -a full partial
+    local line
+
+    for line in ${{(f)"$({complete} "${{(j: :)words[1,CURRENT]}}" {commands} 2>/dev/null)"}}; do
+        if [[ $line == *[-.] ]]; then
+            partial+=("${{line//:/\\:}}")
+        else
+            line=${{line//:/\\:}}
+            full+=("${{line/$'\t'/:}}")
+        fi
+    done
+
+    _describe 'logger' full
+    _describe 'logger' partial -S ''
+}}
+
+compdef _logger logger.py logger
+'''
+
+SCRIPTS = {'bash': BASH_SCRIPT, 'zsh': ZSH_SCRIPT}
+
+
+def script(shell, commands):
+    # the script runs this file directly rather than logger.py, so a completion
+    # only pays for the interpreter, os, shlex and sqlite3
+    complete = ' '.join(map(shlex.quote, [sys.executable, os.path.abspath(__file__)]))
+    return SCRIPTS[shell].format(complete=complete, commands=' '.join(map(shlex.quote, commands)))
+
+
+class Completer:
+    def __init__(self, commands):
+        self.db_path = settings.db_path()
+        self.commands = commands
+        self.conn = None
+
+    def _split(self, line):
+        # the line ends at the cursor, so it can stop inside a quote
+        for quote in ('', '"', "'"):
+            try:
+                words = shlex.split(line + quote)
+            except ValueError:
+                continue
+
+            if not quote and (not line or line[-1].isspace()):
+                words.append('')
+            return words
+
+        return []
+
+    def _args(self, words):
+        # drops the program name and leading options like --format json
+        words = words[1:]
+
+        while len(words) > 1 and words[0].startswith('--'):
+            option = words.pop(0)
+            if option == '--format' and len(words) > 1:
+                words.pop(0)
+
+        return words
+
+    def _query(self, statement, parameters=()):
+        try:
+            if self.conn is None:
+                if not os.path.isfile(self.db_path):
+                    return []
+
+                # read only, a completion never creates a DB, migrates it or waits on a writer
+                path = self.db_path.replace('%', '%25').replace('?', '%3f').replace('#', '%23')
+                self.conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+
+            return self.conn.execute(statement, parameters).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def _book_ids(self, prefix):
+        if not prefix:
+            return self._query('SELECT id, title FROM book ORDER BY id LIMIT ?', (BOOK_LIMIT,))
+
+        # IDs are written without leading zeros
+        if prefix.startswith('0'):
+            return []
+
+        rows = self._query('SELECT MAX(id) FROM book')
+        if not rows or rows[0][0] is None:
+            return []
+
+        # the IDs starting with 12 are [12, 13), [120, 130), ..., each a seek on id and each
+        # above the last, so the ranges are read in order until the limit is filled
+        books, low, high = [], int(prefix), int(prefix) + 1
+        while low <= rows[0][0] and len(books) < BOOK_LIMIT:
+            books += self._query('SELECT id, title FROM book WHERE id >= ? AND id < ? ORDER BY id LIMIT ?', (low, high, BOOK_LIMIT - len(books)))
+            low, high = low * 10, high * 10
+
+        return books
+
+    def _books(self, prefix):
+        if prefix.isdecimal() or not prefix:
+            rows = self._book_ids(prefix)
+        else:
+            pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            rows = self._query("SELECT id, title FROM book WHERE title LIKE ? ESCAPE '\\' ORDER BY id LIMIT ?", (pattern, BOOK_LIMIT))
+
+        return [(str(book_id), title) for book_id, title in rows]
+
+    def _date_prefixes(self, prefix, length, suffix):
+        prefixes, date = [], prefix
+
+        while True:
+            rows = self._query('SELECT MIN(date) FROM log WHERE date >= ? AND date < ?', (date, prefix + '~'))
+            if not rows or rows[0][0] is None:
+                return prefixes
+
+            prefixes.append((rows[0][0][:length] + suffix, ''))
+            date = rows[0][0][:length] + '~'
+
+    def _log_ids(self, prefix):
+        for length, suffix in LOG_ID_LEVELS:
+            if len(prefix) < length:
+                return self._date_prefixes(prefix, length, suffix)
+
+        rows = self._query('SELECT time_start FROM log WHERE date = ? ORDER BY time_start', (prefix[:10],))
+        log_ids = (f'{prefix[:10]}.{time_start[:5]}' for time_start, in rows)
+        return [(log_id, '') for log_id in log_ids if log_id.startswith(prefix)]
+
+    def _book_field(self, book_id, field, prefix):
+        if not book_id.isdigit():
+            return []
+
+        rows = self._query(f'SELECT {field} FROM book WHERE id = ?', (int(book_id),))
+        return [(value, '') for value, in rows if value and value.startswith(prefix)]
+
+    def _candidates(self, kind, prefix, args):
+        if kind == 'book':
+            return self._books(prefix)
+
+        if kind == 'item':
+            log_ids = self._log_ids(prefix) if not prefix or prefix[0].isdigit() else []
+            return self._books(prefix) + log_ids
+
+        if kind in ('title', 'author'):
+            return self._book_field(args[0], kind, prefix)
+
+        if kind == 'shell':
+            return [(shell, '') for shell in SHELLS if shell.startswith(prefix)]
+
+        return []
+
+    def complete(self, words):
+        if not words:
+            return []
+
+        *args, prefix = words
+
+        if not args:
+            return [(name, '') for name in self.commands if name.startswith(prefix)]
+
+        command, *args = args
+        kinds = ARGUMENTS.get(command, [])
+
+        if len(args) < len(kinds):
+            kind = kinds[len(args)]
+        else:
+            kind = REPEATED_ARGUMENTS.get(command)
+
+        return self._candidates(kind, prefix, args)
+
+    def complete_line(self, line):
+        return self.complete(self._args(self._split(line)))
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(1)
+
+    candidates = Completer(sys.argv[2:]).complete_line(sys.argv[1])
+    sys.stdout.write(''.join(f'{candidate}\t{description}\n' if description else f'{candidate}\n' for candidate, description in candidates))
+
+
+if __name__ == '__main__':
+    main()
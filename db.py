@@ -0,0 +1,1207 @@
+import re
+import math
+import time
+import random
+import unicodedata
+
+import settings
+
+from functools import wraps
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, select, insert, update, delete, and_, or_, false, func, text, table, column, literal_column, tuple_, type_coerce, Column, ForeignKey, CheckConstraint, Index, Integer, String, Date, Time
+from sqlalchemy.exc import DatabaseError, OperationalError
+from sqlalchemy.orm import relationship, backref, declarative_base, aliased, Session
+
+from printer import Printer
+
+
+Base = declarative_base()
+
+
+class Book(Base):
+    __tablename__ = "book"
+
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
+    author = Column(String)
+
+    logs = relationship("Log", backref=backref("book"), passive_deletes=True)
+
+
+def log_duration(context):
+    info = context.get_current_parameters()
+    time_start, time_end = info['time_start'], info['time_end']
+    return (time_end.hour * 60 + time_end.minute - time_start.hour * 60 - time_start.minute) % 1440
+
+
+class Log(Base):
+    __tablename__ = "log"
+    __table_args__ = (
+            CheckConstraint("time_start < time_end"),
+            CheckConstraint("page_start <= page_end"),
+            Index("ix_log_book_id_date_time_start", "book_id", "date", "time_start"),
+            )
+
+    book_id = Column(Integer, ForeignKey("book.id", ondelete="CASCADE"), nullable=False)
+
+    date = Column(Date, primary_key=True)
+    time_start = Column(Time, primary_key=True)
+    time_end = Column(Time, nullable=False)
+    page_start = Column(Integer)
+    page_end = Column(Integer)
+    depth = Column(Integer)
+    duration_minutes = Column(Integer, default=log_duration)
+
+
+class BookStats(Base):
+    __tablename__ = "book_stats"
+
+    book_id = Column(Integer, ForeignKey("book.id", ondelete="CASCADE"), primary_key=True)
+    log_count = Column(Integer, nullable=False, server_default='0')
+    page_count = Column(Integer, nullable=False, server_default='0')
+    minute_count = Column(Integer, nullable=False, server_default='0')
+    date_first = Column(Date)
+    date_last = Column(Date)
+
+
+LOG_PAGES = "CASE WHEN {row}.page_start AND {row}.page_end THEN MAX({row}.page_end - {row}.page_start, 1) ELSE 0 END"
+LOG_MINUTES = "{row}.duration_minutes"
+LOG_DURATION = (
+    "((CAST(substr({row}.time_end, 1, 2) AS INTEGER) * 60 + CAST(substr({row}.time_end, 4, 2) AS INTEGER))"
+    " - (CAST(substr({row}.time_start, 1, 2) AS INTEGER) * 60 + CAST(substr({row}.time_start, 4, 2) AS INTEGER))"
+    " + 1440) % 1440"
+)
+# log_duration_insert may run after the stats triggers, which then see the row without its duration
+LOG_TRIGGER_MINUTES = f"COALESCE({LOG_MINUTES}, {LOG_DURATION})"
+
+
+LOG_DURATION_UPDATE = f"""CREATE TRIGGER log_duration_update AFTER UPDATE OF time_start, time_end ON log BEGIN
+    UPDATE log SET duration_minutes = {LOG_DURATION.format(row='new')} WHERE date = new.date AND time_start = new.time_start;
+END"""
+# the ORM fills duration_minutes itself, this covers inserts from other clients
+LOG_DURATION_INSERT = f"""CREATE TRIGGER log_duration_insert AFTER INSERT ON log WHEN new.duration_minutes IS NULL BEGIN
+    UPDATE log SET duration_minutes = {LOG_DURATION.format(row='new')} WHERE date = new.date AND time_start = new.time_start;
+END"""
+
+
+# stats SQL is built per minutes expression: migrations written before duration_minutes
+# existed keep computing minutes from the times
+def rebuild_stats(minutes):
+    return [
+        """DELETE FROM book_stats""",
+        f"""INSERT INTO book_stats(book_id, log_count, page_count, minute_count, date_first, date_last)
+            SELECT book.id, COUNT(log.book_id), COALESCE(SUM({LOG_PAGES.format(row='log')}), 0),
+                COALESCE(SUM({minutes.format(row='log')}), 0), MIN(log.date), MAX(log.date)
+            FROM book LEFT JOIN log ON log.book_id = book.id
+            GROUP BY book.id""",
+    ]
+
+
+def log_stats(minutes):
+    return [
+        f"""CREATE TRIGGER book_stats_log_insert AFTER INSERT ON log BEGIN
+            INSERT OR IGNORE INTO book_stats(book_id) VALUES (new.book_id);
+            UPDATE book_stats SET
+                log_count = log_count + 1,
+                page_count = page_count + {LOG_PAGES.format(row='new')},
+                minute_count = minute_count + {minutes.format(row='new')},
+                date_first = MIN(COALESCE(date_first, new.date), new.date),
+                date_last = MAX(COALESCE(date_last, new.date), new.date)
+            WHERE book_id = new.book_id;
+        END""",
+        f"""CREATE TRIGGER book_stats_log_delete AFTER DELETE ON log BEGIN
+            UPDATE book_stats SET
+                log_count = log_count - 1,
+                page_count = page_count - {LOG_PAGES.format(row='old')},
+                minute_count = minute_count - {minutes.format(row='old')},
+                date_first = CASE WHEN old.date = date_first THEN (SELECT MIN(date) FROM log WHERE book_id = old.book_id) ELSE date_first END,
+                date_last = CASE WHEN old.date = date_last THEN (SELECT MAX(date) FROM log WHERE book_id = old.book_id) ELSE date_last END
+            WHERE book_id = old.book_id;
+        END""",
+        f"""CREATE TRIGGER book_stats_log_update AFTER UPDATE ON log BEGIN
+            UPDATE book_stats SET
+                log_count = log_count - 1,
+                page_count = page_count - {LOG_PAGES.format(row='old')},
+                minute_count = minute_count - {minutes.format(row='old')},
+                date_first = (SELECT MIN(date) FROM log WHERE book_id = old.book_id),
+                date_last = (SELECT MAX(date) FROM log WHERE book_id = old.book_id)
+            WHERE book_id = old.book_id;
+            INSERT OR IGNORE INTO book_stats(book_id) VALUES (new.book_id);
+            UPDATE book_stats SET
+                log_count = log_count + 1,
+                page_count = page_count + {LOG_PAGES.format(row='new')},
+                minute_count = minute_count + {minutes.format(row='new')},
+                date_first = (SELECT MIN(date) FROM log WHERE book_id = new.book_id),
+                date_last = (SELECT MAX(date) FROM log WHERE book_id = new.book_id)
+            WHERE book_id = new.book_id;
+        END""",
+    ]
+
+
+REBUILD_STATS = rebuild_stats(LOG_MINUTES)
+LOG_STATS = log_stats(LOG_TRIGGER_MINUTES)
+
+
+BOOK_STATS = [
+    """CREATE TRIGGER book_stats_book_insert AFTER INSERT ON book BEGIN
+        INSERT OR IGNORE INTO book_stats(book_id) VALUES (new.id);
+    END""",
+    """CREATE TRIGGER book_stats_book_delete AFTER DELETE ON book BEGIN
+        DELETE FROM book_stats WHERE book_id = old.id;
+    END""",
+    *log_stats(LOG_DURATION),
+    *rebuild_stats(LOG_DURATION),
+]
+
+
+# the tables as migrations 1 and 2 created them, the models have moved on since. IF NOT EXISTS
+# leaves the tables of DBs made before migrations were tracked to migration 2
+LOG_TABLE = """CREATE TABLE {exists}log (
+    book_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    time_start TIME NOT NULL,
+    time_end TIME NOT NULL,
+    page_start INTEGER,
+    page_end INTEGER,
+    depth INTEGER,
+    PRIMARY KEY (date, time_start),
+    CHECK (time_start < time_end),
+    CHECK (page_start <= page_end),
+    FOREIGN KEY(book_id) REFERENCES book (id) ON DELETE CASCADE
+)"""
+LOG_INDEX = """CREATE INDEX IF NOT EXISTS ix_log_book_id_date ON log (book_id, date)"""
+TABLES = [
+    """CREATE TABLE IF NOT EXISTS book (
+        id INTEGER NOT NULL,
+        title VARCHAR,
+        author VARCHAR,
+        PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS book_stats (
+        book_id INTEGER NOT NULL,
+        log_count INTEGER DEFAULT '0' NOT NULL,
+        page_count INTEGER DEFAULT '0' NOT NULL,
+        minute_count INTEGER DEFAULT '0' NOT NULL,
+        date_first DATE,
+        date_last DATE,
+        PRIMARY KEY (book_id),
+        FOREIGN KEY(book_id) REFERENCES book (id) ON DELETE CASCADE
+    )""",
+    LOG_TABLE.format(exists='IF NOT EXISTS '),
+    LOG_INDEX,
+]
+
+
+LOG_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+
+
+STATS_PERIODS = {
+    'day': lambda date: type_coerce(date, String),
+    'week': lambda date: func.strftime('%Y-W%W', date),
+    'month': lambda date: func.substr(date, 1, 7),
+    'year': lambda date: func.substr(date, 1, 4),
+}
+
+
+FREE_BOOK_IDS = """
+    SELECT start, end FROM (
+        SELECT :id_min AS start, MIN(id) - 1 AS end FROM book WHERE id >= :id_min
+        UNION ALL
+        SELECT id + 1, (SELECT MIN(next.id) FROM book AS next WHERE next.id > book.id AND next.id <= :id_max) - 1
+        FROM book WHERE id BETWEEN :id_min AND :id_max
+    )
+    WHERE start <= end
+"""
+
+
+book_fts = table('book_fts', column('rowid'), column('title'), column('author'))
+
+
+SEARCH_INDEX = [
+    """CREATE VIRTUAL TABLE book_fts USING fts5(
+        title, author, content='book', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER book_fts_insert AFTER INSERT ON book BEGIN
+        INSERT INTO book_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    """CREATE TRIGGER book_fts_delete AFTER DELETE ON book BEGIN
+        INSERT INTO book_fts(book_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    END""",
+    """CREATE TRIGGER book_fts_update AFTER UPDATE ON book BEGIN
+        INSERT INTO book_fts(book_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO book_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    """INSERT INTO book_fts(book_fts) VALUES ('rebuild')""",
+]
+
+
+meta = table('meta', column('key'), column('value'))
+
+
+META = [
+    """CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)""",
+    """INSERT INTO meta (key, value) VALUES ('version', 0)""",
+]
+
+
+book_trigram = table('book_trigram', column('trigram'), column('book_id'))
+
+
+def _trigram_fold():
+    # SQLite can't normalize Unicode, so folding is a fixed map: ASCII case, Latin letters to their
+    # unaccented base, and punctuation to the space words are split on
+    fold = {}
+    for code in [*range(1, 128), *range(0xA0, 0x250), *range(0x2010, 0x2028)]:
+        char = chr(code)
+        base = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c)).lower()
+
+        if len(base) == 1 and base.isascii() and (base.isalnum() or base == '_'):
+            if base != char:
+                fold[char] = base
+        elif not (char.isalnum() or char == '_'):
+            fold[char] = ' '
+
+    return fold
+
+
+TRIGRAM_FOLD = _trigram_fold()
+TRIGRAM_FOLD_TABLE = str.maketrans(TRIGRAM_FOLD)
+
+
+# trigrams are made in SQL, so a book written by any client keeps its index rows; {books} selects
+# (book_id, text, 0, '') and each row is folded a character at a time, then split into words
+def book_trigrams(books):
+    fold_from, fold_to = (''.join(chars).replace("'", "''") for chars in zip(*TRIGRAM_FOLD.items()))
+    return f"""WITH RECURSIVE fold(book_id, source, i, text) AS (
+            {books}
+            UNION ALL
+            SELECT book_id, source, i + 1, text || coalesce(
+                substr('{fold_to}', nullif(instr('{fold_from}', substr(source, i + 1, 1)), 0), 1),
+                substr(source, i + 1, 1)
+            )
+            FROM fold WHERE i < length(source)
+        )
+        SELECT substr('  ' || word.value || ' ', position.key + 1, 3), fold.book_id
+        FROM fold,
+            json_each('["' || replace(fold.text, ' ', '","') || '"]') AS word,
+            json_each('[' || rtrim(replace(hex(zeroblob(length(word.value) + 1)), '00', '0,'), ',') || ']') AS position
+        WHERE fold.i = length(fold.source) AND word.value != ''"""
+
+
+BOOK_TRIGRAM_TEXT = "coalesce({row}.title, '') || ' ' || coalesce({row}.author, '')"
+TRIGRAM_INDEX = [
+    """CREATE TABLE book_trigram (
+        trigram TEXT NOT NULL,
+        book_id INTEGER NOT NULL,
+        PRIMARY KEY (trigram, book_id)
+    ) WITHOUT ROWID""",
+    """CREATE INDEX ix_book_trigram_book_id ON book_trigram (book_id)""",
+    f"""CREATE TRIGGER book_trigram_insert AFTER INSERT ON book BEGIN
+        INSERT OR IGNORE INTO book_trigram(trigram, book_id)
+        {book_trigrams(f"SELECT new.id, {BOOK_TRIGRAM_TEXT.format(row='new')}, 0, ''")};
+    END""",
+    """CREATE TRIGGER book_trigram_delete AFTER DELETE ON book BEGIN
+        DELETE FROM book_trigram WHERE book_id = old.id;
+    END""",
+    f"""CREATE TRIGGER book_trigram_update AFTER UPDATE ON book BEGIN
+        DELETE FROM book_trigram WHERE book_id = old.id;
+        INSERT OR IGNORE INTO book_trigram(trigram, book_id)
+        {book_trigrams(f"SELECT new.id, {BOOK_TRIGRAM_TEXT.format(row='new')}, 0, ''")};
+    END""",
+    f"""INSERT OR IGNORE INTO book_trigram(trigram, book_id)
+        {book_trigrams(f"SELECT book.id, {BOOK_TRIGRAM_TEXT.format(row='book')}, 0, '' FROM book")}""",
+]
+
+
+change_log = table('change_log', column('seq'), column('table_name'), column('key'), column('clock'), column('replica'), column('deleted'))
+
+
+CHANGE_CLOCK = "UPDATE meta SET value = MAX(value + 1, CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)) WHERE key = 'clock'"
+# delete then insert rather than OR REPLACE, which the outer statement's conflict clause would override,
+# so the row moves to a new seq
+CHANGE_ROW = """DELETE FROM change_log WHERE table_name = '{table}' AND key = {key};
+            INSERT INTO change_log(table_name, key, clock, replica, deleted)
+            VALUES ('{table}', {key}, (SELECT value FROM meta WHERE key = 'clock'), (SELECT value FROM meta WHERE key = 'replica'), {deleted})"""
+# keys are compared as TEXT, an integer would leave the (table_name, key) index narrowed to table_name
+BOOK_KEY = "CAST({row}.id AS TEXT)"
+LOG_KEY = "{row}.date || '.' || {row}.time_start"
+REPLICA_ID = "random() & 9223372036854775807"
+
+
+def change_log_triggers(name, key, columns):
+    return [
+        f"""CREATE TRIGGER change_log_{name}_insert AFTER INSERT ON {name} BEGIN
+            {CHANGE_CLOCK};
+            {CHANGE_ROW.format(table=name, key=key.format(row='new'), deleted=0)};
+        END""",
+        f"""CREATE TRIGGER change_log_{name}_delete AFTER DELETE ON {name} BEGIN
+            {CHANGE_CLOCK};
+            {CHANGE_ROW.format(table=name, key=key.format(row='old'), deleted=1)};
+        END""",
+        f"""CREATE TRIGGER change_log_{name}_update AFTER UPDATE OF {columns} ON {name} BEGIN
+            {CHANGE_CLOCK};
+            {CHANGE_ROW.format(table=name, key=key.format(row='old'), deleted=1)};
+            {CHANGE_ROW.format(table=name, key=key.format(row='new'), deleted=0)};
+        END""",
+    ]
+
+
+# duration_minutes is left out of log updates, it's derived and rewritten by log_duration_update
+CHANGE_LOG_TRIGGERS = {
+    'book': change_log_triggers('book', BOOK_KEY, 'id, title, author'),
+    'log': change_log_triggers('log', LOG_KEY, 'book_id, date, time_start, time_end, page_start, page_end, depth'),
+}
+
+CHANGE_LOG = [
+    """CREATE TABLE change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        clock INTEGER NOT NULL,
+        replica INTEGER NOT NULL,
+        deleted INTEGER NOT NULL,
+        UNIQUE (table_name, key)
+    )""",
+    """CREATE TABLE sync_state (replica INTEGER PRIMARY KEY, seq INTEGER NOT NULL)""",
+    f"""INSERT OR IGNORE INTO meta (key, value) VALUES ('replica', {REPLICA_ID}), ('clock', 0)""",
+    CHANGE_CLOCK,
+    *CHANGE_LOG_TRIGGERS['book'],
+    *CHANGE_LOG_TRIGGERS['log'],
+    f"""INSERT INTO change_log(table_name, key, clock, replica, deleted)
+        SELECT 'book', {BOOK_KEY.format(row='book')}, clock.value, replica.value, 0
+        FROM book, meta AS clock, meta AS replica WHERE clock.key = 'clock' AND replica.key = 'replica'""",
+    f"""INSERT INTO change_log(table_name, key, clock, replica, deleted)
+        SELECT 'log', {LOG_KEY.format(row='log')}, clock.value, replica.value, 0
+        FROM log, meta AS clock, meta AS replica WHERE clock.key = 'clock' AND replica.key = 'replica'""",
+]
+
+
+# a random stamp per book, made where the book was added and carried along by sync: two replicas
+# holding the same ID with different stamps added their books independently. The clock dates the
+# book's current ID, so a renumbering reaches replicas still holding the old one. Books from before
+# this migration have no stamp and are never taken for a collision
+BOOK_ORIGIN = [
+    """CREATE TABLE book_origin (id INTEGER PRIMARY KEY, origin INTEGER NOT NULL, clock INTEGER NOT NULL)""",
+    """CREATE INDEX ix_book_origin_origin ON book_origin (origin)""",
+    f"""CREATE TRIGGER book_origin_insert AFTER INSERT ON book BEGIN
+        DELETE FROM book_origin WHERE id = new.id;
+        INSERT INTO book_origin (id, origin, clock) VALUES (new.id, {REPLICA_ID}, (SELECT value FROM meta WHERE key = 'clock'));
+    END""",
+    """CREATE TRIGGER book_origin_delete AFTER DELETE ON book BEGIN
+        DELETE FROM book_origin WHERE id = old.id;
+    END""",
+    """CREATE TRIGGER book_origin_update AFTER UPDATE OF id ON book WHEN old.id != new.id BEGIN
+        DELETE FROM book_origin WHERE id = new.id;
+        UPDATE book_origin SET id = new.id WHERE id = old.id;
+    END""",
+]
+
+# the books {src} changed since {dst} last synced from it. A book's current ID was set by an insert,
+# a renumbering or a sync, each logged, so a collision or a move always involves one of these
+SYNC_BOOK = """CREATE TEMP TABLE sync_book (id INTEGER PRIMARY KEY)"""
+SYNC_BOOKS = """INSERT OR IGNORE INTO temp.sync_book
+    SELECT CAST(key AS INTEGER) FROM {src}.change_log
+    WHERE table_name = 'book' AND seq > COALESCE((
+        SELECT seq FROM {dst}.sync_state WHERE replica = (SELECT value FROM {src}.meta WHERE key = 'replica')
+    ), 0)"""
+BOOK_ID_MOVES = """
+    SELECT local.id, local.clock, remote.id, remote.clock
+    FROM temp.sync_book AS changed
+    JOIN main.book_origin AS local ON local.id = changed.id
+    JOIN other.book_origin AS remote ON remote.origin = local.origin
+    WHERE local.id != remote.id
+    UNION
+    SELECT local.id, local.clock, remote.id, remote.clock
+    FROM temp.sync_book AS changed
+    JOIN other.book_origin AS remote ON remote.id = changed.id
+    JOIN main.book_origin AS local ON local.origin = remote.origin
+    WHERE local.id != remote.id
+"""
+BOOK_ID_COLLISIONS = """
+    SELECT local.id, local.origin, remote.origin
+    FROM temp.sync_book AS changed
+    JOIN main.book_origin AS local ON local.id = changed.id
+    JOIN other.book_origin AS remote ON remote.id = changed.id
+    WHERE local.origin != remote.origin
+"""
+# moves a book and its logs to a new ID on one side; its change_log entry is dropped so the other
+# side's book comes back under the old ID rather than being deleted by the rename
+RENUMBER_BOOK = [
+    """PRAGMA defer_foreign_keys = ON""",
+    """UPDATE {schema}.book SET id = :new WHERE id = :old""",
+    """UPDATE {schema}.book_origin SET clock = :clock WHERE id = :new""",
+    """UPDATE {schema}.log SET book_id = :new WHERE book_id = :old""",
+    """DELETE FROM {schema}.book_stats WHERE book_id = :old""",
+    """INSERT OR IGNORE INTO {schema}.book_stats (book_id) VALUES (:new)""",
+    """DELETE FROM {schema}.change_log WHERE table_name = 'book' AND key = CAST(:old AS TEXT)""",
+]
+
+# the origins of deleted books: a freed ID is handed out again, and the new book's insert replaces
+# the delete in change_log, so a replica still holding the old book would otherwise keep it. This
+# trigger can run before the change_log one, so it advances the clock itself to date after the book
+BOOK_TOMBSTONE = [
+    """CREATE TABLE book_tombstone (origin INTEGER PRIMARY KEY, clock INTEGER NOT NULL)""",
+    """DROP TRIGGER IF EXISTS book_origin_delete""",
+    f"""CREATE TRIGGER book_origin_delete AFTER DELETE ON book BEGIN
+        {CHANGE_CLOCK};
+        DELETE FROM book_tombstone WHERE origin = (SELECT origin FROM book_origin WHERE id = old.id);
+        INSERT INTO book_tombstone (origin, clock)
+        SELECT origin, (SELECT value FROM meta WHERE key = 'clock') FROM book_origin WHERE id = old.id;
+        DELETE FROM book_origin WHERE id = old.id;
+    END""",
+]
+# a delete wins over the last change the other side made to the book, as it would without the reuse
+BOOK_DELETED = """
+    SELECT 1 FROM {alive}.book_tombstone AS tombstone, {dead}.change_log AS change
+    WHERE tombstone.origin = :origin AND change.table_name = 'book' AND change.key = CAST(:id AS TEXT)
+        AND tombstone.clock > change.clock
+"""
+
+
+# applies changes from {src} to {dst}: a row is taken when it changed in {src} since the last sync
+# and its (clock, replica) stamp beats the one {dst} has, so both sides settle on the same rows
+SYNC_CHANGES = [
+    """CREATE TEMP TABLE sync_change (
+        table_name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        clock INTEGER NOT NULL,
+        replica INTEGER NOT NULL,
+        deleted INTEGER NOT NULL,
+        PRIMARY KEY (table_name, key)
+    )""",
+    """INSERT INTO temp.sync_change
+        SELECT remote.table_name, remote.key, remote.clock, remote.replica, remote.deleted
+        FROM {src}.change_log AS remote
+        LEFT JOIN {dst}.change_log AS local ON local.table_name = remote.table_name AND local.key = remote.key
+        WHERE remote.seq > :seq AND (local.seq IS NULL OR (remote.clock, remote.replica) > (local.clock, local.replica))""",
+]
+SYNC_BOOK_JOIN = "{row}.id = CAST(sync_change.key AS INTEGER)"
+SYNC_LOG_JOIN = "{row}.date = substr(sync_change.key, 1, 10) AND {row}.time_start = substr(sync_change.key, 12)"
+SYNC_LOG_COLUMNS = ['book_id', 'time_end', 'page_start', 'page_end', 'depth', 'duration_minutes']
+# updates and inserts are kept apart instead of an upsert, whose conflict clause would override
+# the OR IGNORE the stats triggers rely on
+SYNC = [
+    f"""UPDATE {{dst}}.book SET title = remote.title, author = remote.author
+        FROM temp.sync_change CROSS JOIN {{src}}.book AS remote ON {SYNC_BOOK_JOIN.format(row='remote')}
+        WHERE sync_change.table_name = 'book' AND NOT sync_change.deleted AND book.id = remote.id""",
+    f"""INSERT INTO {{dst}}.book (id, title, author)
+        SELECT remote.id, remote.title, remote.author
+        FROM temp.sync_change CROSS JOIN {{src}}.book AS remote ON {SYNC_BOOK_JOIN.format(row='remote')}
+        WHERE sync_change.table_name = 'book' AND NOT sync_change.deleted AND remote.id NOT IN (SELECT id FROM {{dst}}.book)""",
+    # books keep the stamp of the side they were added on, which the insert trigger just replaced
+    f"""INSERT OR REPLACE INTO {{dst}}.book_origin (id, origin, clock)
+        SELECT remote.id, remote.origin, remote.clock
+        FROM temp.sync_change CROSS JOIN {{src}}.book_origin AS remote ON {SYNC_BOOK_JOIN.format(row='remote')}
+        WHERE sync_change.table_name = 'book' AND NOT sync_change.deleted AND remote.id IN (SELECT id FROM {{dst}}.book)""",
+    f"""UPDATE {{dst}}.log SET {', '.join(f'{name} = remote.{name}' for name in SYNC_LOG_COLUMNS)}
+        FROM temp.sync_change CROSS JOIN {{src}}.log AS remote ON {SYNC_LOG_JOIN.format(row='remote')}
+        WHERE sync_change.table_name = 'log' AND NOT sync_change.deleted
+            AND log.date = remote.date AND log.time_start = remote.time_start AND remote.book_id IN (SELECT id FROM {{dst}}.book)""",
+    f"""INSERT INTO {{dst}}.log (date, time_start, {', '.join(SYNC_LOG_COLUMNS)})
+        SELECT remote.date, remote.time_start, {', '.join(f'remote.{name}' for name in SYNC_LOG_COLUMNS)}
+        FROM temp.sync_change CROSS JOIN {{src}}.log AS remote ON {SYNC_LOG_JOIN.format(row='remote')}
+        WHERE sync_change.table_name = 'log' AND NOT sync_change.deleted AND remote.book_id IN (SELECT id FROM {{dst}}.book)
+            AND NOT EXISTS (SELECT 1 FROM {{dst}}.log AS log WHERE log.date = remote.date AND log.time_start = remote.time_start)""",
+    """DELETE FROM {dst}.log WHERE (date, time_start) IN (
+        SELECT substr(key, 1, 10), substr(key, 12) FROM temp.sync_change WHERE table_name = 'log' AND deleted
+    )""",
+    """DELETE FROM {dst}.book WHERE id IN (
+        SELECT CAST(key AS INTEGER) FROM temp.sync_change WHERE table_name = 'book' AND deleted
+    )""",
+    # logs whose book is gone on this side were skipped, so they keep the stamp the delete left
+    f"""DELETE FROM temp.sync_change WHERE table_name = 'log' AND NOT deleted
+        AND NOT EXISTS (SELECT 1 FROM {{dst}}.log AS log WHERE {SYNC_LOG_JOIN.format(row='log')})""",
+    # rows written above were stamped as local changes by the triggers, give them back their origin stamp
+    """INSERT OR REPLACE INTO {dst}.change_log (table_name, key, clock, replica, deleted)
+        SELECT table_name, key, clock, replica, deleted FROM temp.sync_change""",
+    """UPDATE {dst}.meta SET value = MAX(value, (SELECT COALESCE(MAX(clock), 0) FROM temp.sync_change)) WHERE key = 'clock'""",
+    """INSERT OR REPLACE INTO {dst}.sync_state (replica, seq)
+        SELECT value, (SELECT COALESCE(MAX(seq), 0) FROM {src}.change_log) FROM {src}.meta WHERE key = 'replica'""",
+    """UPDATE {dst}.meta SET value = value + 1 WHERE key = 'version'""",
+]
+
+
+def trigrams(string):
+    words = (string or '').translate(TRIGRAM_FOLD_TABLE).split(' ')
+    return {f'  {word} '[i:i + 3] for word in words if word for i in range(len(word) + 1)}
+
+
+if settings.STORAGE_PROFILE not in settings.STORAGE_PROFILES:
+    Printer().print_error('Invalid Storage Profile', exit=True)
+
+active_storage_profile = settings.STORAGE_PROFILE
+
+
+def apply_storage_profile(dbapi_connection, connection_record):
+    for name, value in settings.STORAGE_PROFILES[active_storage_profile].items():
+        dbapi_connection.execute(f'PRAGMA {name} = {value}')
+
+    connection_record.info['storage_profile'] = active_storage_profile
+
+
+def _on_connect(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+    dbapi_connection.execute('PRAGMA foreign_keys = ON')
+    apply_storage_profile(dbapi_connection, connection_record)
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    # synchronous can't change inside a transaction, so profile switches land on checkout, before BEGIN
+    if connection_record.info.get('storage_profile') != active_storage_profile:
+        apply_storage_profile(dbapi_connection, connection_record)
+
+
+def _on_begin(conn):
+    conn.exec_driver_sql('BEGIN IMMEDIATE' if conn.get_execution_options().get('begin_immediate') else 'BEGIN')
+
+
+def create_sqlite_engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, 'connect', _on_connect)
+    event.listen(engine, 'checkout', _on_checkout)
+    event.listen(engine, 'begin', _on_begin)
+    return engine
+
+
+engine = create_sqlite_engine(settings.db_path())
+
+
+def create_schema(conn, name, statements):
+    if not conn.scalar(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': name}):
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def create_search_index(conn):
+    try:
+        with conn.begin_nested():
+            create_schema(conn, 'book_fts', SEARCH_INDEX)
+    except OperationalError:
+        pass
+
+
+def create_trigram_index(conn):
+    try:
+        with conn.begin_nested():
+            create_schema(conn, 'book_trigram', TRIGRAM_INDEX)
+    except OperationalError:
+        pass
+
+
+def _add_log_duration_minutes(conn):
+    columns = {row[1] for row in conn.exec_driver_sql('PRAGMA table_info(log)')}
+    if 'duration_minutes' not in columns:
+        conn.exec_driver_sql('ALTER TABLE log ADD COLUMN duration_minutes INTEGER')
+
+    # stats triggers are dropped during the backfill so book_stats isn't recomputed row by row
+    for name in ('book_stats_log_insert', 'book_stats_log_delete', 'book_stats_log_update', 'log_duration_update'):
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+
+    # one statement: the migration runs in a single transaction, batches wouldn't free anything
+    conn.exec_driver_sql(f"UPDATE log SET duration_minutes = {LOG_DURATION.format(row='log')}")
+
+    for statement in [*LOG_STATS, LOG_DURATION_UPDATE]:
+        conn.execute(text(statement))
+
+
+def _create_meta(conn):
+    create_schema(conn, 'meta', META)
+
+
+def _create_change_log(conn):
+    create_schema(conn, 'change_log', CHANGE_LOG)
+
+
+def _create_book_origin(conn):
+    create_schema(conn, 'book_origin', BOOK_ORIGIN)
+
+
+def _fold_trigram_index(conn):
+    # the index used to be filled by a Python function registered on each connection, which any
+    # other client writing to book didn't have
+    for name in ('book_trigram_insert', 'book_trigram_delete', 'book_trigram_update'):
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+    conn.exec_driver_sql('DROP TABLE IF EXISTS book_trigram')
+
+    create_trigram_index(conn)
+
+
+def _cast_change_log_book_key(conn):
+    for name in ('insert', 'delete', 'update'):
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS change_log_book_{name}')
+
+    for statement in CHANGE_LOG_TRIGGERS['book']:
+        conn.execute(text(statement))
+
+
+def _create_book_tombstone(conn):
+    create_schema(conn, 'book_tombstone', BOOK_TOMBSTONE)
+
+
+def _fill_log_duration_minutes(conn):
+    for name in ('book_stats_log_insert', 'book_stats_log_delete', 'book_stats_log_update', 'log_duration_insert'):
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+
+    for statement in [*LOG_STATS, LOG_DURATION_INSERT]:
+        conn.execute(text(statement))
+
+
+def _create_tables(conn):
+    for statement in TABLES:
+        conn.exec_driver_sql(statement)
+    create_schema(conn, 'book_stats_log_insert', BOOK_STATS)
+    create_search_index(conn)
+
+
+def _cascade_log_book_id(conn):
+    sql = conn.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'log'"))
+    if 'ON DELETE CASCADE' in sql:
+        return
+
+    columns = ', '.join(row[1] for row in conn.exec_driver_sql('PRAGMA table_info(log)'))
+
+    conn.exec_driver_sql('ALTER TABLE log RENAME TO log_old')
+    conn.exec_driver_sql(LOG_TABLE.format(exists=''))
+    conn.exec_driver_sql(f'INSERT INTO log ({columns}) SELECT {columns} FROM log_old')
+    # the old table's index keeps its name through the rename
+    conn.exec_driver_sql('DROP TABLE log_old')
+    conn.exec_driver_sql(LOG_INDEX)
+
+    for statement in log_stats(LOG_DURATION):
+        conn.execute(text(statement))
+
+
+def _index_log_book_id_date_time_start(conn):
+    conn.exec_driver_sql('DROP INDEX IF EXISTS ix_log_book_id_date')
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_log_book_id_date_time_start ON log (book_id, date, time_start)')
+
+
+MIGRATIONS = [
+    _create_tables,
+    _cascade_log_book_id,
+    _index_log_book_id_date_time_start,
+    create_trigram_index,
+    _create_meta,
+    _add_log_duration_minutes,
+    _create_change_log,
+    _create_book_origin,
+    _fold_trigram_index,
+    _cast_change_log_book_key,
+    _create_book_tombstone,
+    _fill_log_duration_minutes,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+class MigrationError(Exception):
+    def __init__(self, version, error):
+        super().__init__(f'Migration to schema version {version} failed: {error}')
+        self.version = version
+
+
+def create_tables(engine):
+    with engine.connect() as conn:
+        version = conn.exec_driver_sql('PRAGMA user_version').scalar()
+        conn.rollback()
+
+        if version >= SCHEMA_VERSION:
+            return
+
+        dbapi_connection = conn.connection.dbapi_connection
+        dbapi_connection.execute('PRAGMA foreign_keys = OFF')
+
+        try:
+            for version, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                try:
+                    with conn.begin():
+                        migration(conn)
+                        conn.exec_driver_sql(f'PRAGMA user_version = {version}')
+                except DatabaseError as error:
+                    raise MigrationError(version, getattr(error, 'orig', error)) from error
+        finally:
+            dbapi_connection.execute('PRAGMA foreign_keys = ON')
+
+
+try:
+    create_tables(engine)
+except MigrationError as error:
+    Printer().print_error(str(error), exit=True)
+except DatabaseError:
+    Printer().print_error('Invalid DB Path', exit=True)
+
+
+def retry_locked(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        for attempt in range(settings.WRITE_RETRIES):
+            try:
+                return method(self, *args, **kwargs)
+            except OperationalError as error:
+                if self.batch or 'database is locked' not in str(error.orig) or attempt == settings.WRITE_RETRIES - 1:
+                    raise
+                time.sleep(settings.WRITE_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    return wrapper
+
+
+class DB:
+    def __init__(self):
+        self.session = Session(engine)
+        self.batch = False
+
+    @contextmanager
+    def session_scope(self):
+        if self.batch:
+            yield self.session
+            return
+
+        with self.transaction() as session:
+            yield session
+
+    @contextmanager
+    def transaction(self):
+        # writes take the lock up front, so busy_timeout waits for other writers
+        # instead of failing on a read snapshot they have made stale
+        self.session.commit()
+        self.session.connection(execution_options={'begin_immediate': True})
+        self.batch = True
+
+        try:
+            yield self.session
+            self.session.execute(update(meta).where(meta.c.key == 'version').values(value=meta.c.value + 1))
+            self.session.commit()
+        except:
+            self.session.rollback()
+            raise
+        finally:
+            self.batch = False
+            self.session.close()
+
+    def end_transaction(self):
+        self.session.commit()
+
+    @contextmanager
+    def storage_profile(self, name):
+        global active_storage_profile
+
+        self.session.commit()
+        previous, active_storage_profile = active_storage_profile, name
+
+        try:
+            yield
+        finally:
+            self.session.commit()
+            active_storage_profile = previous
+
+    def _free_book_ids(self):
+        id_min, id_max = settings.BOOK_ID_RANGE
+        id_top = self.session.scalar(select(func.max(Book.id)).where(Book.id.between(id_min, id_max)))
+
+        if id_top is None:
+            yield from range(id_min, id_max + 1)
+            return
+
+        yield from range(id_top + 1, id_max + 1)
+
+        for start, end in self.session.execute(text(FREE_BOOK_IDS), {'id_min': id_min, 'id_max': id_top}):
+            yield from range(start, end + 1)
+
+    def _generate_book_id(self):
+        return next(self._free_book_ids(), None)
+
+    def _is_valid_book_id(self, book_id):
+        return bool(self.book_obj(book_id))
+
+    def _is_valid_log_id(self, date, time_start):
+        return bool(self.log_obj(date, time_start))
+
+    def _log_id(self, date, time_start):
+        return and_(Log.date == date, Log.time_start == time_start)
+
+    def _has_search_index(self):
+        return bool(self.session.scalar(text("SELECT 1 FROM sqlite_master WHERE name = 'book_fts'")))
+
+    def _has_trigram_index(self):
+        return bool(self.session.scalar(text("SELECT 1 FROM sqlite_master WHERE name = 'book_trigram'")))
+
+    def _log_key(self):
+        return func.printf('%s.%s', Log.date, func.substr(Log.time_start, 1, 5))
+
+    def _log_glob(self, pattern):
+        clause = self._log_key().op('GLOB')(pattern)
+        prefix = re.split(r'[*?\[]', pattern, maxsplit=1)[0][:10]
+
+        if prefix:
+            date = type_coerce(Log.date, String)
+            clause = and_(date >= prefix, date < prefix[:-1] + chr(ord(prefix[-1]) + 1), clause)
+
+        return clause
+
+    def log_filter(self, log_ids=(), patterns=(), date_ranges=()):
+        clauses = []
+
+        if log_ids:
+            clauses.append(tuple_(Log.date, Log.time_start).in_(log_ids))
+
+        for pattern in patterns:
+            clauses.append(self._log_glob(pattern))
+
+        for date_start, date_end in date_ranges:
+            clauses.append(Log.date.between(date_start, date_end))
+
+        return or_(false(), *clauses)
+
+    def _search_match(self, query):
+        tokens = re.findall(r'\w+', query)
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def _select_books(self):
+        return (
+            select(Book.id, Book.title, Book.author, func.coalesce(BookStats.log_count, 0).label('log_count'))
+            .outerjoin(BookStats, BookStats.book_id == Book.id)
+        )
+
+    def search(self, query):
+        books = self._select_books()
+        match = self._search_match(query) if self._has_search_index() else ''
+
+        if not match:
+            query = books.where(or_(Book.id.contains(query), Book.title.contains(query), Book.author.contains(query)))
+            return self.session.execute(query).all()
+
+        fts = literal_column('book_fts')
+        results = self.session.execute(
+            books
+            .join(book_fts, book_fts.c.rowid == Book.id)
+            .where(fts.op('MATCH')(match))
+            .order_by(func.bm25(fts))
+        ).all()
+
+        if query.isdigit() and int(query) not in {book.id for book in results}:
+            results = self.session.execute(books.where(Book.id == int(query))).all() + results
+
+        return results
+
+    def fuzzy_search(self, query):
+        query_trigrams = trigrams(query)
+
+        if not query_trigrams or not self._has_trigram_index():
+            return []
+
+        matches = func.count()
+        scores = (
+            select(book_trigram.c.book_id, (matches * 1.0 / len(query_trigrams)).label('score'))
+            .where(book_trigram.c.trigram.in_(query_trigrams))
+            .group_by(book_trigram.c.book_id)
+            .having(matches >= math.ceil(settings.SEARCH_FUZZY_THRESHOLD * len(query_trigrams)))
+            .order_by(matches.desc())
+            .limit(settings.SEARCH_FUZZY_LIMIT)
+            .subquery()
+        )
+
+        query = (
+            self._select_books()
+            .join(scores, scores.c.book_id == Book.id)
+            .order_by(scores.c.score.desc(), Book.title)
+        )
+
+        return self.session.execute(query).all()
+
+    def book_obj(self, book_id):
+        query = select(Book).where(Book.id == book_id)
+        return self.session.scalar(query)
+
+    def log_obj(self, date, time_start):
+        query = select(Log).where(self._log_id(date, time_start))
+        return self.session.scalar(query)
+    
+    def get_book_stats(self, book_id):
+        return self.session.get(BookStats, book_id)
+
+    def get_all_books(self):
+        query = self._select_books().order_by(Book.title)
+        return self.session.execute(query).all()
+
+    def iter_logs(self, date_start=None, date_end=None, book_id=None):
+        key = Log.date, Log.time_start
+        query = select(Log.book_id, *key, Log.time_end, Log.page_start, Log.page_end, Log.depth).order_by(*key).limit(LOG_PAGE_SIZE)
+
+        if date_start:
+            query = query.where(Log.date >= date_start)
+
+        if date_end:
+            query = query.where(Log.date <= date_end)
+
+        if book_id:
+            query = query.where(Log.book_id == book_id)
+
+        page = self.session.execute(query).all()
+
+        while page:
+            yield from page
+
+            if len(page) < LOG_PAGE_SIZE:
+                return
+
+            last = page[-1]
+            page = self.session.execute(query.where(tuple_(*key) > (last.date, last.time_start))).all()
+
+    def stream_books(self):
+        query = select(Book.id, Book.title, Book.author).order_by(Book.id)
+        yield from self.session.execute(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+
+    def stream_logs(self):
+        query = select(Log.book_id, Log.date, Log.time_start, Log.time_end, Log.page_start, Log.page_end, Log.depth).order_by(Log.date, Log.time_start)
+        yield from self.session.execute(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+
+    def get_stats(self, period, book_id=None):
+        pages = literal_column(LOG_PAGES.format(row='log'))
+        minutes = literal_column(LOG_MINUTES.format(row='log'))
+        bucket = STATS_PERIODS[period](Log.date).label('period')
+
+        periods = select(
+            bucket,
+            func.count().label('log_count'),
+            func.sum(pages).label('page_count'),
+            func.sum(minutes).label('minute_count'),
+        ).group_by(bucket)
+
+        if book_id:
+            periods = periods.where(Log.book_id == book_id)
+
+        periods = periods.subquery()
+        query = select(
+            periods,
+            func.sum(periods.c.log_count).over().label('total_log_count'),
+            func.sum(periods.c.page_count).over().label('total_page_count'),
+            func.sum(periods.c.minute_count).over().label('total_minute_count'),
+        ).order_by(periods.c.period)
+
+        return self.session.execute(query).all()
+
+    def get_overlapping_logs(self, date, time_start, time_end):
+        query = select(Log.date, Log.time_start, Log.time_end).where(Log.date == date, Log.time_start < time_end, Log.time_end > time_start)
+        return self.session.execute(query).all()
+
+    def get_log_spans(self, date_start, date_end):
+        query = select(Log.date, Log.time_start, Log.time_end).where(Log.date.between(date_start, date_end))
+        return self.session.execute(query).tuples().all()
+
+    def get_overlaps(self):
+        # one ordered pass over the primary key flags every log starting before an earlier one
+        # on the same day has ended; only flagged logs are joined back to find their partners
+        end_before = func.max(Log.time_end).over(partition_by=Log.date, order_by=Log.time_start, rows=(None, -1))
+        ordered = select(Log.date, Log.time_start, end_before.label('end_before')).subquery()
+        flagged = select(ordered.c.date, ordered.c.time_start).where(ordered.c.end_before > ordered.c.time_start).subquery()
+
+        earlier = aliased(Log)
+        query = (
+            select(
+                earlier.date,
+                earlier.time_start,
+                earlier.time_end,
+                flagged.c.time_start.label('overlap_time_start'),
+            )
+            .join(earlier, and_(earlier.date == flagged.c.date, earlier.time_start < flagged.c.time_start, earlier.time_end > flagged.c.time_start))
+            .order_by(earlier.date, earlier.time_start, flagged.c.time_start)
+        )
+
+        return self.session.execute(query).all()
+
+    def get_books(self, book_ids):
+        query = select(Book.id, Book.title).where(Book.id.in_(book_ids))
+        return self.session.execute(query).all()
+
+    def get_logs(self, log_ids):
+        query = select(Log.date, Log.time_start).where(tuple_(Log.date, Log.time_start).in_(log_ids))
+        return set(self.session.execute(query).tuples())
+
+    def count_logs(self, book_ids, logs):
+        query = select(func.count()).select_from(Log).where(or_(Log.book_id.in_(book_ids), logs))
+        return self.session.scalar(query)
+
+    def get_book_ids(self):
+        query = select(Book.id)
+        return set(self.session.scalars(query))
+
+    def get_log_ids(self, date_start, date_end):
+        query = select(Log.date, Log.time_start).where(Log.date.between(date_start, date_end))
+        return set(self.session.execute(query).tuples())
+
+    @retry_locked
+    def update_book(self, book_id, **info):
+        with self.session_scope() as session:
+            query = update(Book).where(Book.id == book_id).values(**info)
+            session.execute(query)
+
+    @retry_locked
+    def insert_log(self, **info):
+        with self.session_scope() as session:
+            # checked under the write lock, so a log another writer just added can't slip past
+            overlaps = self.get_overlapping_logs(info['date'], info['time_start'], info['time_end'])
+
+            if overlaps:
+                return overlaps[0]
+
+            query = insert(Log).values(**info)
+            session.execute(query)
+
+    @retry_locked
+    def insert_book(self, **info):
+        with self.session_scope() as session:
+            book_id = self._generate_book_id()
+
+            if book_id is None:
+                return
+
+            query = insert(Book).values(id=book_id, **info)
+            session.execute(query)
+
+        return book_id
+
+    @retry_locked
+    def insert_items(self, books=(), logs=()):
+        with self.session_scope() as session:
+            if books:
+                session.execute(insert(Book.__table__), books)
+            if logs:
+                session.execute(insert(Log.__table__), logs)
+
+    @retry_locked
+    def delete_items(self, book_ids, logs):
+        with self.session_scope() as session:
+            session.execute(delete(Log).where(logs), execution_options={'synchronize_session': False})
+            session.execute(delete(Book).where(Book.id.in_(book_ids)), execution_options={'synchronize_session': False})
+
+    @retry_locked
+    def rebuild_stats(self):
+        with self.session_scope() as session:
+            for statement in REBUILD_STATS:
+                session.execute(text(statement))
+
+    def _sync_changes(self, conn, src, dst):
+        seq = conn.scalar(text(f"SELECT seq FROM {dst}.sync_state WHERE replica = (SELECT value FROM {src}.meta WHERE key = 'replica')")) or 0
+        for statement in SYNC_CHANGES:
+            conn.execute(text(statement.format(src=src, dst=dst)), {'seq': seq})
+
+        for statement in SYNC:
+            conn.execute(text(statement.format(src=src, dst=dst)))
+
+        count = conn.scalar(text('SELECT COUNT(*) FROM temp.sync_change'))
+        conn.exec_driver_sql('DROP TABLE temp.sync_change')
+        return count
+
+    def _has_book(self, conn, schema, book_id):
+        return conn.scalar(text(f'SELECT 1 FROM {schema}.book WHERE id = :id'), {'id': book_id}) is not None
+
+    def _free_sync_book_ids(self, conn):
+        id_min, id_max = settings.BOOK_ID_RANGE
+        tops = {
+            schema: conn.scalar(text(f'SELECT MAX(id) FROM {schema}.book WHERE id BETWEEN :id_min AND :id_max'), {'id_min': id_min, 'id_max': id_max})
+            for schema in ('main', 'other')
+        }
+        main_top = tops['main'] or id_min - 1
+        id_top = max(main_top, tops['other'] or id_min - 1)
+
+        yield from range(id_top + 1, id_max + 1)
+
+        # the range is full at the top: IDs free on this side, below and above its own top, are
+        # probed on the other one
+        gaps = conn.execute(text(FREE_BOOK_IDS), {'id_min': id_min, 'id_max': main_top}).all()
+        for start, end in [*gaps, (main_top + 1, id_top)]:
+            yield from (book_id for book_id in range(start, min(end, id_top) + 1) if not self._has_book(conn, 'other', book_id))
+
+    def _renumber_book(self, conn, schema, book_id, new_id, clock):
+        for statement in RENUMBER_BOOK:
+            conn.execute(text(statement.format(schema=schema)), {'old': book_id, 'new': new_id, 'clock': clock})
+        conn.execute(text('INSERT OR IGNORE INTO temp.sync_book (id) VALUES (:id)'), {'id': new_id})
+
+    def _deleted_side(self, conn, book_id, origin, other_origin):
+        for dead, alive, dead_origin in (('main', 'other', origin), ('other', 'main', other_origin)):
+            if conn.scalar(text(BOOK_DELETED.format(dead=dead, alive=alive)), {'id': book_id, 'origin': dead_origin}):
+                return dead
+
+    def _drop_book(self, conn, schema, book_id):
+        # the entries this delete stamps are dropped, so the live side's book and the deletes it
+        # already holds for the old logs come across instead of newer deletes going the other way
+        seq = conn.scalar(text(f'SELECT COALESCE(MAX(seq), 0) FROM {schema}.change_log'))
+        conn.execute(text(f'DELETE FROM {schema}.book WHERE id = :id'), {'id': book_id})
+        conn.execute(text(f'DELETE FROM {schema}.change_log WHERE seq > :seq'), {'seq': seq})
+
+    def _renumber_books(self, conn):
+        # IDs come from the top of each side's own books, so books added on two replicas between
+        # syncs land on the same ID. The one with the larger stamp moves to an ID free on both sides,
+        # and a book renumbered like that moves to its latest ID wherever it is still under an older one
+        renumbered = []
+
+        conn.execute(text(SYNC_BOOK))
+        for src, dst in (('main', 'other'), ('other', 'main')):
+            conn.execute(text(SYNC_BOOKS.format(src=src, dst=dst)))
+
+        while True:
+            for book_id, clock, other_id, other_clock in conn.execute(text(BOOK_ID_MOVES)).all():
+                if (clock, book_id) < (other_clock, other_id):
+                    schema, book_id, new_id, clock = 'main', book_id, other_id, other_clock
+                else:
+                    schema, book_id, new_id = 'other', other_id, book_id
+
+                # an ID still taken on this side shows up as a collision below and is freed first
+                if not self._has_book(conn, schema, new_id):
+                    break
+            else:
+                collision = conn.execute(text(BOOK_ID_COLLISIONS)).first()
+                if collision is None:
+                    conn.exec_driver_sql('DROP TABLE temp.sync_book')
+                    return renumbered
+
+                book_id, origin, other_origin = collision
+
+                dead = self._deleted_side(conn, book_id, origin, other_origin)
+                if dead:
+                    self._drop_book(conn, dead, book_id)
+                    continue
+
+                new_id = next(self._free_sync_book_ids(conn), None)
+                if new_id is None:
+                    return None
+
+                schema = 'main' if origin > other_origin else 'other'
+                clock = conn.scalar(text("SELECT MAX(local.value, remote.value) + 1 FROM main.meta AS local, other.meta AS remote WHERE local.key = 'clock' AND remote.key = 'clock'"))
+
+            self._renumber_book(conn, schema, book_id, new_id, clock)
+            renumbered.append((schema == 'other', book_id, new_id))
+
+    @retry_locked
+    def sync(self, path):
+        other_engine = create_sqlite_engine(path)
+        try:
+            create_tables(other_engine)
+        finally:
+            other_engine.dispose()
+
+        self.session.commit()
+
+        with engine.connect() as conn:
+            # ATTACH can't run inside a transaction, so it goes through the driver before BEGIN
+            dbapi_connection = conn.connection.dbapi_connection
+            dbapi_connection.execute('ATTACH DATABASE ? AS other', (path,))
+
+            try:
+                with conn.execution_options(begin_immediate=True).begin() as transaction:
+                    replica = "SELECT value FROM {schema}.meta WHERE key = 'replica'"
+                    # a DB copied by hand carries the same replica ID, the copy gets a new one
+                    if conn.scalar(text(replica.format(schema='main'))) == conn.scalar(text(replica.format(schema='other'))):
+                        conn.exec_driver_sql(f"UPDATE other.meta SET value = {REPLICA_ID} WHERE key = 'replica'")
+
+                    renumbered = self._renumber_books(conn)
+                    if renumbered is None:
+                        transaction.rollback()
+                        return None
+
+                    received = self._sync_changes(conn, 'other', 'main')
+                    sent = self._sync_changes(conn, 'main', 'other')
+            finally:
+                dbapi_connection.execute('DETACH DATABASE other')
+
+        return received, sent, renumbered
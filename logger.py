@@ -1,546 +1,37 @@
 import os
-import logging
 import sys
-import textwrap
-import random
+import csv
+import json
+import shlex
 
-import settings
-
-from itertools import zip_longest
-from datetime import datetime, timedelta
-from contextlib import contextmanager
-from sqlalchemy import create_engine, select, insert, update, and_, or_, Column, ForeignKey, CheckConstraint, Integer, String, Date, Time
-from sqlalchemy.orm import relationship, backref, declarative_base, Session
-
-
-logging.basicConfig(format='%(message)s', level=logging.INFO)
-
-
-Base = declarative_base()
-
-
-class Book(Base):
-    __tablename__ = "book"
-
-    id = Column(Integer, primary_key=True)
-    title = Column(String)
-    author = Column(String)
-
-    logs = relationship("Log", backref=backref("book"))
-
-
-class Log(Base):
-    __tablename__ = "log"
-    __table_args__ = (
-            CheckConstraint("time_start < time_end"),
-            CheckConstraint("page_start <= page_end"),
-            )
-
-    book_id = Column(Integer, ForeignKey("book.id"), nullable=False)
-
-    date = Column(Date, primary_key=True)
-    time_start = Column(Time, primary_key=True)
-    time_end = Column(Time, nullable=False)
-    page_start = Column(Integer)
-    page_end = Column(Integer)
-    depth = Column(Integer)
-
-
-class Printer:
-    def __init__(self):
-        self.width = self._find_apt_value(settings.WIDTH, os.get_terminal_size().columns)
-        self.columns = self._find_apt_value(settings.COLUMNS.copy(), self.width)
-        self.indent = ('', 1, 'l')
-        self.gutter = ' ' * 3
-        self.margin = ' ' * 2
-
-    def _parse_layout_options(self, options, locals=None):
-        layout = []
-
-        if not options:
-            return [('', 0, 'l')]
-
-        for param, option in options.items():
-            if param == 'BLANK':
-                layout.append(('', option['span'], 'l'))
-            else:
-                name = locals[param] if locals else option['name']
-                layout.append((name, option['span'], option['align']))
-
-        return layout
-  
-    def _find_apt_value(self, items, value):
-        apt_value = items.get('default')
-
-        for item in items:
-            if item != 'default' and value >= item:
-                apt_value = items[item]
-
-        return apt_value
-
-    def _truncate(self, string, width, align=None):
-        if len(string) > width:
-            string = f'{string[:width-3].strip()}...'
-            if align and align == 'l':
-                return string.ljust(width)
-            if align and align == 'r':
-                return string.rjust(width)
-
-        return string
-
-    def _format_item(self, string, width, align, wrap):
-        items = []
-
-        if not string:
-            return [(''.ljust(width), width, align)]
-
-        if isinstance(string, dict):
-            string = self._find_apt_value(string, width)
-
-        string = str(string)
-        strings = textwrap.wrap(string, width=width) if wrap else [self._truncate(string, width, align)]
-
-        for string in strings:
-            if align == 'l':
-                string = string.ljust(width)
-            if align == 'r':
-                string = string.rjust(width)
-            items.append((string, width, align))
-
-        return items
-
-    def _format_line(self, items, wrap=False, full_just=False, background_color='', foreground_color=''):
-        current_index = 0
-        formatted_items = []
-
-        for string, span, align in items:
-            if span <= 0:
-                continue
-
-            width = (span - 1) * 3 + sum(self.columns[current_index:current_index+span])
-            current_index += span
-
-            if isinstance(string, list):
-                ins_str = []
-                for item in string:
-                    ins_str.extend(self._format_item(item, width, align, wrap))
-                formatted_items.append(ins_str)
-            else:
-                formatted_items.append(self._format_item(string, width, align, wrap)) 
-            
-        lines = [list(field) for field in list(zip_longest(*formatted_items, fillvalue=None))]
-
-        line_strings = []
-
-        for line in lines:
-            line_fields = []
-            for j, sub_f in enumerate(line):
-                if not sub_f:
-                    width = lines[0][j][1]
-                    line_fields.append(''.ljust(width))
-                else:
-                    line_fields.append(sub_f[0])
-            line_strings.append(line_fields)
-
-        for i, line_string in enumerate(line_strings):
-            line_string = self.margin + self.gutter.join(line_string)
-
-            if full_just:
-                line_string = line_string.ljust(self.width)
-
-            if settings.ENABLE_COLOR:
-                if not foreground_color:
-                    foreground_color = '\x1b[38;2;{};{};{}m'.format(*settings.COLOR_FOREGROUND)
-                line_string = f'{foreground_color}{background_color}{line_string}\x1b[0m'
-
-            line_strings[i] = line_string
-        
-        return line_strings
-    
-    def _format_count(self, count, name):
-        string = name if count == 1 else name + 's'
-        return f'{count} {string}'
-
-    def _format_count_log(self, log_count):
-        return self._format_count(log_count, 'log')
-
-    def _format_count_book(self, book_count):
-        return self._format_count(book_count, 'book')
-
-    def _format_count_page(self, page_count):
-        return self._format_count(page_count, 'page')
-
-    def _format_count_hour(self, hour_count):
-        return self._format_count(hour_count, 'hour')
-
-    def print_line(self, items, print_method=logging.info, new_line_before=False, new_line_after=False, **kwargs):
-        line_strings = self._format_line(items, **kwargs)
-
-        if new_line_before:
-            print_method('')
-
-        for line_string in line_strings:
-            print_method(line_string)
-
-        if new_line_after:
-            print_method('')
-
-    def print_empty_line(self):
-        self.print_line([('', 1, 'l')])
-
-    def print_item_count(self, book_count=None, log_count=None, page_count=None, hour_count=None, **kwargs):
-        fields = []
-        log_count_string = self._format_count_log(log_count)
-        book_count_string = self._format_count_book(book_count)
-        page_count_string = self._format_count_page(page_count)
-        hour_count_string = self._format_count_hour(hour_count)
-
-        if book_count is not None:
-            fields.append(book_count_string)
-
-        if log_count is not None:
-            fields.append(log_count_string)
-
-        if page_count is not None:
-            fields.append(page_count_string)
-
-        if hour_count is not None:
-            fields.append(hour_count_string)
-
-        string = ', '.join(fields)
-        items = [self.indent, (string, 5, 'l')]
-        self.print_line(items, **kwargs)
-
-    def print_field(self, name, value):
-        items = [self.indent, (name, 1, 'r'), (value, 4, 'l')] 
-        self.print_line(items, wrap=True)
-
-    def print_action(self, action, **kwargs):
-        items = [self.indent, (action, 5, 'l')]
-        self.print_line(items, **kwargs)
-
-    def print_error(self, error, exit=False, **kwargs):
-        items = [self.indent, (error, 5, 'l')]
-        self.print_line(items, wrap=True, print_method=logging.error, **kwargs)
-
-        if exit:
-            sys.exit(1)
-
-    def print_usage(self, usage):
-        self.print_field('Usage', usage)
-        sys.exit(1)
-
-    def print_table_headers(self, headers, **kwargs):
-        items = self._parse_layout_options(headers)
-        self.print_line(items, **kwargs)
-
-    def print_table_book(self, books, show_count=True, new_line_before=False, new_line_after=False):
-        headers = {
-                'id': {
-                'name': '', 
-                'span': 1, 
-                'align': 'l', 
-            }, 
-            'title': {
-                'name': 'Title', 
-                'span': 2, 
-                'align': 'l', 
-            }, 
-            'author': {
-                'name': 'Author', 
-                'span': 2, 
-                'align': 'l', 
-            }, 
-            'log_count': {
-                'name': '', 
-                'span': 1, 
-                'align': 'l', 
-            }
-        }
-        highlight = True
-        total_log_count = 0
-
-        if new_line_before:
-            self.print_empty_line()
-
-        for book in books:
-            id = book.id
-            author = book.author
-            log_count = len(book.logs) if book.logs else ''
-            title = book.title if book.title else ''
-            total_log_count += len(book.logs)
-            items = self._parse_layout_options(headers, locals=locals())
-
-            if settings.ENABLE_COLOR and highlight:
-                self.print_line(items, background_color='\x1b[48;2;{};{};{}m'.format(*settings.COLOR_ROW_BACKGROUND), full_just=True)
-                highlight = False
-            else:
-                self.print_line(items)
-                highlight = True
-
-        self.print_table_headers(headers)
-
-        if show_count:
-            self.print_item_count(len(books), total_log_count, new_line_before=True)
-
-        if new_line_after:
-            self.print_empty_line()
-
-    def print_table_log(self, logs, show_count=True, new_line_before=False, new_line_after=False):
-        headers = {
-            'BLANK': {
-                'span': 1
-            },
-            'date': {
-                'name': 'Date', 
-                'span': 1, 
-                'align': 'l', 
-            }, 
-            'time': {
-                'name': 'Time', 
-                'span': 1, 
-                'align': 'l', 
-            }, 
-            'pages': {
-                'name': 'Pages', 
-                'span': 1, 
-                'align': 'l', 
-            }, 
-            'depth': {
-                'name': 'Depth', 
-                'span': 1, 
-                'align': 'r', 
-            }, 
-        }
-        highlight=True
-
-        logs.sort(key=lambda r: r.date)
-
-        if new_line_before:
-            self.print_empty_line()
-        
-        for log in logs:
-            date = settings.FORMAT_DATE.copy()
-            time = f'{log.time_start.strftime("%H:%M")} {log.time_end.strftime("%H:%M")}'
-            depth = log.depth
-            pages = ''
-
-            if log.page_start and log.page_end:
-                pages = f'{str(log.page_start).ljust(4)} {str(log.page_end).ljust(4)}'
-
-            for item in date:
-                date[item] = log.date.strftime(date[item])
-
-            items = self._parse_layout_options(headers, locals=locals())
-
-            if settings.ENABLE_COLOR and highlight:
-                self.print_line(items, background_color='\x1b[48;2;{};{};{}m'.format(*settings.COLOR_ROW_BACKGROUND), full_just=True)
-                highlight = False
-            else:
-                self.print_line(items)
-                highlight = True
-
-        self.print_table_headers(headers)
-
-        if show_count:
-            self.print_item_count(log_count=len(logs), new_line_before=True)
-
-        if new_line_after:
-            self.print_empty_line()
-    
-    def print_books(self, books, empty_message):
-        if not books:
-            self.print_error(empty_message)
-        else:
-            self.print_table_book(books)
-        
-    def print_book_expand(self, book, new_line_before=False, new_line_after=False):
-        id = book.id
-        title = 'Unknown Book' if not book.title else book.title
-        author = 'Unknown Author' if not book.author else book.author
-
-        row1_items = [(id, 1, 'l'), (title, 5, 'l')]
-        row2_items = [self.indent, (author, 5, 'l')]
-
-        if new_line_before:
-            self.print_empty_line()
-
-        self.print_line(row1_items, wrap=True)
-        self.print_line(row2_items, wrap=True)
-
-        if new_line_after:
-            self.print_empty_line()
-
-    def get_book_stats(self, book):
-        total_page_count, total_hour_count = 0, 0
-
-        for log in book.logs:
-            if log.page_end and log.page_start:
-                if log.page_end == log.page_start:
-                    total_page_count += 1
-                else:
-                    total_page_count += log.page_end - log.page_start
-            total_hour_count += delta_from_time(log.time_start, log.time_end) / 3600
-
-        return total_page_count, round(total_hour_count, 1)
-
-    def print_book_info(self, book):
-        empty_message = 'No Logs'
-        
-        if not book.logs:
-            self.print_error(empty_message)
-            self.print_book_expand(book, new_line_before=True)
-        else:
-            page_count, hour_count = self.get_book_stats(book)
-            self.print_table_log(book.logs, show_count=False, new_line_after=True)
-            self.print_book_expand(book, new_line_after=True)
-            self.print_item_count(log_count=len(book.logs), page_count=page_count, hour_count=hour_count)
-
-    def confirm_delete(self, books, logs):
-        input_field = ''.join(self._format_line([self.indent, self.indent]) + [self.gutter])
-        log_count = self._format_count_log(len(logs))
-        book_count = self._format_count_book(len(books))
-
-        if books:
-            if len(books) == 1:
-                book = next(iter(books))
-                if book.title:
-                    book_title = self._truncate(book.title, 35)
-                    text = f'\"{book_title}\"'
-                else:
-                    text = book_count
-            else:
-                text = book_count
-            if logs:
-                text += f' and {log_count}'
-        else:
-            text = log_count
-
-        prompt = f'Delete {text}?'
-        items = [self.indent, (prompt, 5, 'l')]
-
-        self.print_line(items, wrap=True)
-
-        confirm = input(input_field)
-
-        return confirm in {'yes', 'y', 'delete'}
-
-
-db_path = os.path.abspath(os.path.expanduser(settings.DB_PATH)) if settings.DB_PATH else '.logger.db'
-engine = create_engine(f"sqlite:///{db_path}?foreign_keys=1")
-
-
-try:
-    Base.metadata.create_all(engine)
-except:
-    Printer().print_error('Invalid DB Path', exit=True)
-
-
-session = Session(engine)
-
-
-@contextmanager
-def session_scope():
-    try:
-        yield session
-        session.commit()
-    except:
-        session.rollback()
-        raise
-    finally:
-        session.close()
-
-
-class DB:
-    def __init__(self):
-        pass
-
-    def _generate_book_id(self):
-        while True:
-            book_id = random.randint(1000,9999)
-            if not self._is_valid_book_id(book_id):
-                return book_id
-
-    def _is_valid_book_id(self, book_id):
-        return bool(self.book_obj(book_id))
-
-    def _is_valid_log_id(self, date, time_start):
-        return bool(self.log_obj(date, time_start))
-
-    def _log_id(self, date, time_start):
-        return and_(Log.date == date, Log.time_start == time_start)
-
-    def search(self, query):
-        query = select(Book).where(or_(Book.id.contains(query), Book.title.contains(query), Book.author.contains(query)))
-        return session.scalars(query).all()
+from functools import lru_cache, cached_property
+from contextlib import nullcontext
+from datetime import datetime
 
-    def book_obj(self, book_id):
-        query = select(Book).where(Book.id == book_id)
-        return session.scalar(query)
-
-    def log_obj(self, date, time_start):
-        query = select(Log).where(self._log_id(date, time_start))
-        return session.scalar(query)
-    
-    def get_all_books(self):
-        query = select(Book).order_by(Book.title)
-        return session.scalars(query).all()
-
-    def update_book(self, book_id, **info):
-        with session_scope() as session:
-            query = update(Book).where(Book.id == book_id).values(**info)
-            session.execute(query)
-
-    def insert_log(self, **info):
-        with session_scope() as session:
-            query = insert(Log).values(**info)
-            session.execute(query)
-
-    def insert_book(self, **info):
-        with session_scope() as session:
-            query = insert(Book).values(id=self._generate_book_id(), **info)
-            session.execute(query)
-
-    def delete_items(self, items):
-        with session_scope() as session:
-            for item in items:
-                session.delete(item)
-
-
-def delta_from_time(start_time, end_time):
-    start_time_delta = timedelta(hours=start_time.hour, minutes=start_time.minute)
-    end_time_delta = timedelta(hours=end_time.hour, minutes=end_time.minute)
-    return (end_time_delta - start_time_delta).seconds
+import settings
 
+from printer import Printer
 
-def get_book(book_id):
-    db = DB()
-    try:
-        book_id = int(book_id)
-        if db._is_valid_book_id(book_id):
-            return db.book_obj(book_id)
-    except ValueError:
-        pass
-    return
 
+def parse_item_id(item_id):
+    if item_id.isdigit():
+        return 'book', int(item_id)
 
-def get_item(item_id):
-    db = DB()
-    book = get_book(item_id)
+    if '..' in item_id:
+        dates = tuple(map(is_valid_date, item_id.split('..', 1)))
+        if all(dates):
+            return 'range', dates
 
-    if book:
-        return book
+    if any(char in item_id for char in '*?['):
+        return 'glob', item_id
 
     try:
         id = datetime.strptime(item_id, '%Y-%m-%d.%H:%M')
-        date = id.date()
-        time_start = id.time()
-        if db._is_valid_log_id(date, time_start):
-            return db.log_obj(date, time_start)
+        return 'log', (id.date(), id.time())
     except ValueError:
         pass
 
-    return
+    return None, None
 
 
 def is_valid_title(title):
@@ -557,6 +48,7 @@ def is_valid_author(name):
     return name
 
 
+@lru_cache(maxsize=4096)
 def is_valid_date(date):
     try:
         date = datetime.strptime(date, '%Y-%m-%d')
@@ -565,6 +57,7 @@ def is_valid_date(date):
         return False
 
 
+@lru_cache(maxsize=4096)
 def is_valid_time_span(time_span):
     try:
         start, end = [datetime.strptime(t, '%H:%M').time() for t in time_span.split('-')]
@@ -593,6 +86,20 @@ def is_valid_depth(depth):
         return False
 
 
+def is_valid_id(id):
+    if not id.isdecimal():
+        return False
+
+    return int(id)
+
+
+def is_valid_count(count):
+    if not count.isdecimal() or not int(count):
+        return False
+
+    return int(count)
+
+
 def parse_args(fields, args, usage):
     printer = Printer()
     args = (*args, *('',) * (len(fields) - len(args)))
@@ -620,15 +127,89 @@ def parse_args(fields, args, usage):
     return arg_fields
 
 
+def check_fields(fields, values):
+    arg_fields = dict()
+
+    for params in fields:
+        name, metavar, required, check, error = params.values()
+        value = values.get(name)
+        value = '' if value is None else str(value).strip()
+
+        if not value:
+            if required:
+                return None, f'{metavar} is required'
+            arg_fields[name] = None
+            continue
+
+        if check:
+            res = check(value)
+            if res is False:
+                return None, error
+            if res is not True:
+                value = res
+
+        arg_fields[name] = value
+
+    return arg_fields, None
+
+
+def read_rows(path):
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            yield from csv.DictReader(f)
 
+    else:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
 
-ERR_INVALID_COMMAND = 'Invalid Command: add, edit, remove, show, search'
 
+def write_rows(path, fieldnames, rows):
+    count = 0
 
-class Add:
-    def __init__(self):
-        self.db = DB()
-        self.printer = Printer()
+    with open(path, 'w', newline='') as f:
+        if path.endswith('.csv'):
+            writer = csv.DictWriter(f, fieldnames)
+            writer.writeheader()
+            for count, row in enumerate(rows, start=1):
+                writer.writerow(row)
+
+        else:
+            for count, row in enumerate(rows, start=1):
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    return count
+
+
+ERR_INVALID_COMMAND = 'Invalid Command: add, edit, remove, show, search, logs, stats, audit, import, export, backup, sync, batch, rebuild-stats, completion, shell'
+
+
+class Command:
+    def __init__(self, db=None, printer=None):
+        self.printer = printer or Printer()
+        self.check_book_ids = True
+
+        if db:
+            self.db = db
+
+    @cached_property
+    def db(self):
+        from db import DB
+
+        return DB()
+
+    def _is_valid_book_id(self, book_id):
+        # a batch checks every line before running any, when books added earlier in it don't exist yet
+        if not self.check_book_ids:
+            return book_id.isdigit()
+
+        return self.db._is_valid_book_id(book_id)
+
+
+class Add(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
 
         self.fields_book = [
             {
@@ -651,7 +232,7 @@ class Add:
                 'name': 'book_id',
                 'metavar': 'Book ID',
                 'required': True,
-                'check': self.db._is_valid_book_id,
+                'check': self._is_valid_book_id,
                 'error': 'Invalid Book ID'
             },
             {
@@ -690,7 +271,7 @@ class Add:
 
         self.action = 'Added'
 
-    def run(self, args):
+    def check(self, args):
         if len(args) < 1:
             self.printer.print_usage(self.usage)
         
@@ -701,18 +282,15 @@ class Add:
             if not args or len(args) > 2:
                 self.printer.print_usage(self.usage_book)
 
-            args = parse_args(self.fields_book, args, self.usage_book)
+            return command, parse_args(self.fields_book, args, self.usage_book)
 
-            self.db.insert_book(**args)
-            self.printer.print_action('Added')
-
-        elif command == 'log':
+        if command == 'log':
             if not args or len(args) > 4:
                 self.printer.print_usage(self.usage_log)
 
             args = parse_args(self.fields_log, args, self.usage_log)
 
-            args = {
+            return command, {
                 'book_id': args['book_id'], 
                 'date': args['date'], 
                 'time_start': args['time'][0], 
@@ -722,27 +300,302 @@ class Add:
                 'depth': args['depth'], 
             }
 
-            if self.db._is_valid_log_id(args['date'], args['time_start']):
+        self.printer.print_usage(self.usage)
+
+    def run(self, args):
+        command, args = self.check(args)
+
+        if command == 'book':
+            if not self.db.insert_book(**args):
+                self.printer.print_error('No free Book IDs', exit=True)
+
+            self.printer.print_action('Added')
+
+        else:
+            log = self.db.insert_log(**args)
+
+            if log and log.time_start == args['time_start']:
                 self.printer.print_error('Log already exists', exit=True)
+            if log:
+                self.printer.print_error(f'Overlaps log {log.date}.{log.time_start.strftime("%H:%M")}', exit=True)
 
-            self.db.insert_log(**args)
             self.printer.print_action(self.usage)
 
+
+class Import(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.fields_book = [
+            {
+                'name': 'id',
+                'metavar': 'Book ID',
+                'required': False,
+                'check': is_valid_id,
+                'error': 'Book ID must be numerical'
+            },
+            {
+                'name': 'title',
+                'metavar': 'Title',
+                'required': False,
+                'check': is_valid_title,
+                'error': 'Title must be less than 100'
+            },
+            {
+                'name': 'author',
+                'metavar': 'Author',
+                'required': False,
+                'check': is_valid_author,
+                'error': 'Author must be less than 50'
+            }
+        ]
+        self.fields_log = [
+            {
+                'name': 'book_id',
+                'metavar': 'Book ID',
+                'required': True,
+                'check': is_valid_id,
+                'error': 'Invalid Book ID'
+            },
+            {
+                'name': 'date',
+                'metavar': 'Date',
+                'required': True,
+                'check': is_valid_date,
+                'error': 'Date must be of format YYYY-MM-DD'
+            },
+            {
+                'name': 'time',
+                'metavar': 'Time',
+                'required': True,
+                'check': is_valid_time_span,
+                'error': 'Time must be of format H:M-H:M'
+            },
+            {
+                'name': 'pages',
+                'metavar': 'Pages',
+                'required': False,
+                'check': is_valid_page_span,
+                'error': 'Pages must be of format P-P'
+            },
+            {
+                'name': 'depth',
+                'metavar': 'Depth',
+                'required': False,
+                'check': is_valid_depth,
+                'error': 'Depth must be numerical'
+            },
+        ]
+
+        self.usage = 'import <book|log> <file.csv|file.jsonl>'
+
+        self.max_errors = 20
+
+    def _read(self, path, fields):
+        rows, errors = [], []
+
+        if not path.endswith(('.csv', '.jsonl')):
+            self.printer.print_usage(self.usage)
+
+        try:
+            for i, values in enumerate(read_rows(path), start=1):
+                args, error = check_fields(fields, values)
+                if error:
+                    errors.append((i, error))
+                else:
+                    rows.append((i, args))
+        except (OSError, ValueError):
+            self.printer.print_error('Invalid File', exit=True)
+
+        return rows, errors
+
+    def _check_books(self, rows):
+        book_ids = self.db.get_book_ids()
+        books, errors = [], []
+
+        given_ids = {args['id'] for i, args in rows}
+        free_ids = (book_id for book_id in self.db._free_book_ids() if book_id not in given_ids)
+
+        for i, args in rows:
+            book_id = args['id']
+
+            if book_id is None:
+                book_id = next(free_ids, None)
+                if book_id is None:
+                    errors.append((i, 'No free Book IDs'))
+                    continue
+            elif book_id in book_ids:
+                errors.append((i, f'Book ID {book_id} already exists'))
+                continue
+
+            book_ids.add(book_id)
+            books.append({'id': book_id, 'title': args['title'], 'author': args['author']})
+
+        return books, errors
+
+    def _check_logs(self, rows):
+        logs, errors = [], []
+
+        if not rows:
+            return logs, errors
+
+        book_ids = self.db.get_book_ids()
+        dates = [args['date'] for i, args in rows]
+        log_ids = self.db.get_log_ids(min(dates), max(dates))
+        rows_checked = []
+
+        for i, args in rows:
+            log_id = (args['date'], args['time'][0])
+
+            if args['book_id'] not in book_ids:
+                errors.append((i, 'Invalid Book ID'))
+                continue
+
+            if log_id in log_ids:
+                errors.append((i, 'Log already exists'))
+                continue
+
+            log_ids.add(log_id)
+            rows_checked.append(i)
+            logs.append({
+                'book_id': args['book_id'],
+                'date': args['date'],
+                'time_start': args['time'][0],
+                'time_end': args['time'][1],
+                'page_start': args['pages'][0] if args['pages'] else None,
+                'page_end': args['pages'][1] if args['pages'] else None,
+                'depth': args['depth'],
+            })
+
+        errors.extend(self._check_overlaps(rows_checked, logs, min(dates), max(dates)))
+
+        return logs, errors
+
+    def _check_overlaps(self, rows, logs, date_start, date_end):
+        spans = [(*span, None) for span in self.db.get_log_spans(date_start, date_end)]
+        spans.extend((log['date'], log['time_start'], log['time_end'], i) for i, log in zip(rows, logs))
+        spans.sort(key=lambda span: span[:2])
+
+        overlapping = set()
+        last_date, last_end, last_row = None, None, None
+
+        for date, time_start, time_end, row in spans:
+            if date == last_date and time_start < last_end:
+                overlapping.update(r for r in (row, last_row) if r is not None)
+
+            if date != last_date or time_end > last_end:
+                last_date, last_end, last_row = date, time_end, row
+
+        return [(i, 'Overlaps another log') for i in overlapping]
+
+    def _print_errors(self, errors):
+        errors.sort()
+
+        for i, error in errors[:self.max_errors]:
+            self.printer.print_error(f'Row {i}: {error}')
+
+        if len(errors) > self.max_errors:
+            self.printer.print_error(f'{len(errors) - self.max_errors} more errors')
+
+        self.printer.print_error('Nothing imported', exit=True, new_line_before=True)
+
+    def run(self, args):
+        if len(args) != 2:
+            self.printer.print_usage(self.usage)
+
+        command, path = args
+
+        if command == 'book':
+            rows, errors = self._read(path, self.fields_book)
+            books, check_errors = self._check_books(rows)
+            logs = []
+
+        elif command == 'log':
+            rows, errors = self._read(path, self.fields_log)
+            logs, check_errors = self._check_logs(rows)
+            books = []
+
+        else:
+            self.printer.print_usage(self.usage)
+
+        errors.extend(check_errors)
+
+        if errors:
+            self._print_errors(errors)
+
+        from sqlalchemy.exc import IntegrityError
+
+        try:
+            with self.db.storage_profile('bulk'):
+                self.db.insert_items(books=books, logs=logs)
+        except IntegrityError:
+            self.printer.print_error('Invalid Item, nothing imported', exit=True)
+
+        if command == 'book':
+            count = self.printer._format_count_book(len(books))
+        else:
+            count = self.printer._format_count_log(len(logs))
+
+        self.printer.print_action(f'Imported {count}')
+
+
+class Export(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.fields_book = ['id', 'title', 'author']
+        self.fields_log = ['book_id', 'date', 'time', 'pages', 'depth']
+
+        self.usage = 'export <book|log> <file.csv|file.jsonl>'
+
+    def _book_rows(self):
+        for book in self.db.stream_books():
+            yield {'id': book.id, 'title': book.title, 'author': book.author}
+
+    def _log_rows(self):
+        for log in self.db.stream_logs():
+            yield {
+                'book_id': log.book_id,
+                'date': log.date.isoformat(),
+                'time': f'{log.time_start.strftime("%H:%M")}-{log.time_end.strftime("%H:%M")}',
+                'pages': f'{log.page_start}-{log.page_end}' if log.page_start is not None and log.page_end is not None else None,
+                'depth': log.depth,
+            }
+
+    def run(self, args):
+        if len(args) != 2:
+            self.printer.print_usage(self.usage)
+
+        command, path = args
+
+        if not path.endswith(('.csv', '.jsonl')):
+            self.printer.print_usage(self.usage)
+
+        if command == 'book':
+            fields, rows, format_count = self.fields_book, self._book_rows(), self.printer._format_count_book
+        elif command == 'log':
+            fields, rows, format_count = self.fields_log, self._log_rows(), self.printer._format_count_log
         else:
             self.printer.print_usage(self.usage)
 
+        try:
+            count = write_rows(path, fields, rows)
+        except OSError:
+            self.printer.print_error('Invalid File', exit=True)
+
+        self.printer.print_action(f'Exported {format_count(count)}')
 
-class Edit:
-    def __init__(self):
-        self.db = DB()
-        self.printer = Printer()
+
+class Edit(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
 
         self.fields = [
             {
                 'name': 'book_id',
                 'metavar': 'Book ID',
                 'required': True,
-                'check': self.db._is_valid_book_id,
+                'check': self._is_valid_book_id,
                 'error': 'Invalid Book ID'
             },
             {
@@ -765,57 +618,74 @@ class Edit:
 
         self.action = 'Edited'
 
-    def run(self, args):
+    def check(self, args):
         if not args or len(args) > 3:
             self.printer.print_usage(self.usage)
 
-        args = parse_args(self.fields, args, self.usage)
+        return parse_args(self.fields, args, self.usage)
+
+    def run(self, args):
+        args = self.check(args)
 
         self.db.update_book(**args)
         self.printer.print_action(self.action)
 
 
-class Remove:
-    def __init__(self):
-        self.db = DB()
-        self.printer = Printer()
+class Remove(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
 
-        self.usage = 'remove <itemID> ...'
+        self.usage = 'remove <itemID|glob|date..date> ...'
 
         self.action = {True: 'Deleted', False: 'Canceled'}
+        self.confirm = True
 
-    def run(self, args):
+    def _print_invalid(self, arg):
+        self.printer.print_error(f'Invalid Item ID \'{self.printer._truncate(arg, 20)}\'', exit=True)
+
+    def check(self, args):
         if len(args) < 1:
             self.printer.print_usage(self.usage)
         
-        books, logs = set(), set()
+        items = {'book': {}, 'log': {}, 'glob': [], 'range': []}
 
         for arg in args:
-            item = get_item(arg)
+            kind, item = parse_item_id(arg)
 
-            if not item:
-                self.printer.print_error(f'Invalid Item ID \'{self.printer._truncate(arg, 20)}\'', exit=True)
-            
-            if isinstance(item, Log):
-                logs.add(item)
+            if not kind:
+                self._print_invalid(arg)
+
+            if kind in {'book', 'log'}:
+                items[kind][item] = arg
+            else:
+                items[kind].append(item)
+
+        return items
+
+    def run(self, args):
+        items = self.check(args)
+
+        books = self.db.get_books(items['book']) if items['book'] else []
+        found = {book.id for book in books} | (self.db.get_logs(items['log']) if items['log'] else set())
+
+        for item, arg in [*items['book'].items(), *items['log'].items()]:
+            if item not in found:
+                self._print_invalid(arg)
 
-            elif isinstance(item, Book):
-                books.add(item)
-                for log in item.logs:
-                    logs.add(log)
+        logs = self.db.log_filter(items['log'], items['glob'], items['range'])
+        log_count = self.db.count_logs(items['book'], logs)
 
-        confirm = self.printer.confirm_delete(books, logs)
+        confirm = self.printer.confirm_delete(books, log_count) if self.confirm else True
 
         if confirm:
-            self.db.delete_items(logs | books)
+            self.db.delete_items(items['book'], logs)
         
         self.printer.print_action(self.action[confirm], new_line_before=True)
 
 
-class Show:
-    def __init__(self):
-        self.db = DB()
-        self.printer = Printer()
+class Show(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
 
         self.usage = 'show [bookID]'
 
@@ -830,24 +700,24 @@ class Show:
                 self.printer.print_error('Invalid Book ID', exit=True)
         
             if len(args) == 1:
-                self.printer.print_book_info(book)
+                stats = self.db.get_book_stats(book.id)
+                self.printer.print_book_info(book, stats, self.db.iter_logs(book_id=book.id))
 
         else:
             books = self.db.get_all_books()
             self.printer.print_books(books, 'No Books')
 
 
-class Search:
-    def __init__(self):
-        self.db = DB()
-        self.printer = Printer()
+class Search(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
 
         self.usage = 'search <query>'
 
 
     def run(self, args):
         if len(args) == 1:
-            results = self.db.search(args[0])
+            results = self.db.search(args[0]) or self.db.fuzzy_search(args[0])
 
             self.printer.print_books(results, 'No Results')
 
@@ -855,29 +725,493 @@ class Search:
             self.printer.print_usage(self.usage)
 
 
+class Logs(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.fields = [
+            {
+                'name': 'since',
+                'metavar': 'Since',
+                'required': False,
+                'check': is_valid_date,
+                'error': 'Date must be of format YYYY-MM-DD'
+            },
+            {
+                'name': 'until',
+                'metavar': 'Until',
+                'required': False,
+                'check': is_valid_date,
+                'error': 'Date must be of format YYYY-MM-DD'
+            },
+            {
+                'name': 'book',
+                'metavar': 'Book ID',
+                'required': False,
+                'check': self._is_valid_book_id,
+                'error': 'Invalid Book ID'
+            },
+        ]
+
+        self.usage = 'logs [--since <date>] [--until <date>] [--book <bookID>]'
+
+    def run(self, args):
+        options = dict(zip(args[::2], args[1::2]))
+        names = {f'--{field["name"]}' for field in self.fields}
+
+        if len(args) % 2 or len(options) < len(args) // 2 or not set(options) <= names:
+            self.printer.print_usage(self.usage)
+
+        args, error = check_fields(self.fields, {name[2:]: value for name, value in options.items()})
+
+        if error:
+            self.printer.print_error(error, exit=True)
+
+        logs = self.db.iter_logs(args['since'], args['until'], args['book'])
+        self.printer.print_logs(logs, 'No Logs')
+
+
+class Stats(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.periods = ['day', 'week', 'month', 'year']
+        self.fields = [
+            {
+                'name': 'period',
+                'metavar': 'Period',
+                'required': False,
+                'check': lambda period: period in self.periods,
+                'error': 'Period must be one of day, week, month, year'
+            },
+            {
+                'name': 'book_id',
+                'metavar': 'Book ID',
+                'required': False,
+                'check': self._is_valid_book_id,
+                'error': 'Invalid Book ID'
+            },
+        ]
+
+        self.usage = 'stats [day|week|month|year] [bookID]'
+
+    def run(self, args):
+        if len(args) > 2:
+            self.printer.print_usage(self.usage)
+
+        if args and args[0].isdigit():
+            args = ['month', *args]
+
+        args = parse_args(self.fields, args, self.usage)
+        period = args['period'] or 'month'
+
+        stats = self.db.get_stats(period, args['book_id'])
+        self.printer.print_stats(stats, period, 'No Logs')
+
+
+class Audit(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.usage = 'audit'
+
+    def run(self, args):
+        if args:
+            self.printer.print_usage(self.usage)
+
+        overlaps = self.db.get_overlaps()
+        self.printer.print_overlaps(overlaps, 'No Overlaps')
+
+
+class RebuildStats(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.usage = 'rebuild-stats'
+
+        self.action = 'Rebuilt'
+
+    def run(self, args):
+        if args:
+            self.printer.print_usage(self.usage)
+
+        with self.db.storage_profile('bulk'):
+            self.db.rebuild_stats()
+
+        self.printer.print_action(self.action)
+
+
+class Backup(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.fields = [
+            {
+                'name': 'directory',
+                'metavar': 'Directory',
+                'required': True,
+                'check': None,
+                'error': None
+            },
+            {
+                'name': 'keep',
+                'metavar': 'Keep',
+                'required': False,
+                'check': is_valid_count,
+                'error': 'Keep must be a positive number'
+            }
+        ]
+
+        self.usage = 'backup <directory> [keep]'
+
+    def run(self, args):
+        if not args or len(args) > 2:
+            self.printer.print_usage(self.usage)
+
+        args = parse_args(self.fields, args, self.usage)
+
+        import sqlite3
+        import backup as snapshots
+
+        backup = snapshots.Backup(args['directory'], args['keep'] or settings.BACKUP_KEEP)
+
+        if not os.path.isfile(backup.db_path):
+            self.printer.print_error('Invalid DB Path', exit=True)
+
+        try:
+            path = backup.snapshot()
+        except OSError:
+            self.printer.print_error('Invalid Directory', exit=True)
+        except sqlite3.Error:
+            path = None
+
+        if path is None:
+            self.printer.print_error('Backup failed', exit=True)
+
+        removed = backup.rotate()
+
+        self.printer.print_action(f'Backed up to {os.path.basename(path)}')
+        if removed:
+            self.printer.print_action(f'Removed {self.printer._format_count(len(removed), "old snapshot")}')
+
+
+class Sync(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.usage = 'sync <other.db>'
+
+    def run(self, args):
+        if len(args) != 1:
+            self.printer.print_usage(self.usage)
+
+        from db import MigrationError
+        from sqlalchemy.exc import DatabaseError
+
+        path = os.path.abspath(os.path.expanduser(args[0]))
+
+        if not os.path.isfile(path) or os.path.samefile(path, settings.db_path()):
+            self.printer.print_error('Invalid DB Path', exit=True)
+
+        try:
+            result = self.db.sync(path)
+        except MigrationError as error:
+            self.printer.print_error(str(error), exit=True)
+        except DatabaseError:
+            self.printer.print_error('Invalid DB Path', exit=True)
+
+        if result is None:
+            self.printer.print_error('No free Book IDs', exit=True)
+
+        received, sent, renumbered = result
+
+        for other, book_id, new_id in renumbered:
+            where = f' in {os.path.basename(path)}' if other else ''
+            self.printer.print_action(f'Renumbered Book {book_id} to {new_id}{where}')
+
+        received, sent = self.printer._format_count(received, 'change'), self.printer._format_count(sent, 'change')
+        self.printer.print_action(f'Synced, received {received}, sent {sent}')
+
+
+class Batch(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.usage = 'batch <file|->'
+
+        self.commands = {'add': Add, 'edit': Edit, 'remove': Remove}
+
+    def _read(self, path):
+        try:
+            if path == '-':
+                return sys.stdin.read().splitlines()
+
+            with open(path) as f:
+                return f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            self.printer.print_error('Invalid File', exit=True)
+
+    def _parse(self, lines):
+        commands = []
+
+        for i, line in enumerate(lines, start=1):
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+
+            try:
+                args = shlex.split(line)
+            except ValueError:
+                self.printer.print_error(f'Line {i}: Invalid Quoting', exit=True)
+
+            if args[0] not in self.commands:
+                self.printer.print_error(f'Line {i}: Invalid Command: add, edit, remove', exit=True)
+
+            # arguments are checked before the transaction starts; book IDs are only checked to be numbers
+            command = self.commands[args[0]](self.db, self.printer)
+            command.check_book_ids = False
+
+            try:
+                command.check(args[1:])
+            except SystemExit:
+                self.printer.print_error(f'Line {i} is invalid, nothing applied', exit=True)
+
+            commands.append((i, args))
+
+        return commands
+
+    def run(self, args):
+        if len(args) != 1:
+            self.printer.print_usage(self.usage)
+
+        commands = self._parse(self._read(args[0]))
+
+        from sqlalchemy.exc import SQLAlchemyError
+
+        # hold command output until the batch commits, so a rollback leaves nothing claiming success
+        self.printer.buffer = []
+        # stays 0 if the transaction can't start, e.g. another writer holds the lock
+        line = 0
+
+        try:
+            with self.db.transaction():
+                for line, (name, *command_args) in commands:
+                    command = self.commands[name](self.db, self.printer)
+                    command.confirm = False
+                    command.run(command_args)
+        except (SystemExit, SQLAlchemyError) as error:
+            self.printer.buffer = None
+            failed = f'Line {line} failed' if line else 'Batch failed'
+
+            # a command exits after printing its own error, the database's has to be shown here
+            if isinstance(error, SQLAlchemyError):
+                self.printer.print_error(str(getattr(error, 'orig', error)))
+
+            self.printer.print_error(f'{failed}, nothing applied', exit=True)
+
+        line_strings, self.printer.buffer = self.printer.buffer, None
+        self.printer.write(line_strings)
+        self.printer.print_action(f'Applied {self.printer._format_count(len(commands), "command")}', new_line_before=True)
+
+
+class Completion(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.usage = 'completion <bash|zsh>'
+
+    def run(self, args):
+        from complete import SHELLS, script
+
+        if len(args) != 1 or args[0] not in SHELLS:
+            self.printer.print_usage(self.usage)
+
+        sys.stdout.write(script(args[0], COMMANDS))
+
+
+class Shell(Command):
+    def __init__(self, db=None, printer=None):
+        super().__init__(db, printer)
+
+        self.usage = 'shell'
+        self.prompt = 'logger> '
+        self.history_path = os.path.expanduser('~/.logger_history')
+        self.history_length = 1000
+
+        self.exit = {'exit', 'quit'}
+        self.matches = []
+        self.subcommands = {
+            'add': ['book', 'log'],
+            'import': ['book', 'log'],
+        }
+
+    def _complete(self, text, state):
+        import readline
+
+        if state == 0:
+            words = readline.get_line_buffer()[:readline.get_begidx()].split()
+
+            if not words:
+                options = [name for name in COMMANDS if name != 'shell'] + sorted(self.exit)
+                self.matches = [option for option in options if option.startswith(text)]
+            elif len(words) == 1 and words[0] in self.subcommands:
+                self.matches = [option for option in self.subcommands[words[0]] if option.startswith(text)]
+            else:
+                from complete import Completer
+                self.matches = [shlex.quote(candidate) for candidate, description in Completer(COMMANDS).complete(words + [text])]
+
+        if state >= len(self.matches):
+            return None
+
+        # partial log IDs (2024-, 2024-05-, 2024-05-01.) carry on without a space
+        match = self.matches[state]
+        return match if match.endswith(('-', '.')) else match + ' '
+
+    def _run_line(self, line):
+        try:
+            args = shlex.split(line)
+        except ValueError:
+            self.printer.print_error('Invalid Quoting')
+            return
+
+        if not args:
+            return
+
+        command = COMMANDS.get(args[0])
+
+        if not command or command is Shell:
+            self.printer.print_error(ERR_INVALID_COMMAND)
+            return
+
+        from sqlalchemy.exc import SQLAlchemyError
+
+        # a failed command rolls back on its own and the shell carries on
+        try:
+            command(self.db, self.printer).run(args[1:])
+        except SystemExit:
+            pass
+        except SQLAlchemyError as error:
+            self.db.session.rollback()
+            self.printer.print_error(str(getattr(error, 'orig', error)))
+        except KeyboardInterrupt:
+            # Ctrl-C at a prompt or mid-command cancels the command, not the shell; a batch's held
+            # output goes with it
+            self.db.session.rollback()
+            self.printer.buffer = None
+            sys.stdout.write('\n')
+        finally:
+            self.db.end_transaction()
+
+    def run(self, args):
+        if args:
+            self.printer.print_usage(self.usage)
+
+        try:
+            import readline
+        except ImportError:
+            readline = None
+
+        if readline:
+            readline.set_completer(self._complete)
+            readline.set_completer_delims(' ')
+            readline.parse_and_bind('tab: complete')
+            readline.set_history_length(self.history_length)
+            try:
+                readline.read_history_file(self.history_path)
+            except OSError:
+                pass
+
+        while True:
+            try:
+                line = input(self.prompt)
+            except EOFError:
+                sys.stdout.write('\n')
+                break
+            except KeyboardInterrupt:
+                sys.stdout.write('\n')
+                continue
+
+            if line.strip() in self.exit:
+                break
+
+            self._run_line(line)
+
+        if readline:
+            try:
+                readline.write_history_file(self.history_path)
+            except OSError:
+                pass
+
+
+CACHED_COMMANDS = {'show'}
+
+COMMANDS = {
+    'add': Add,
+    'edit': Edit,
+    'remove': Remove,
+    'show': Show,
+    'search': Search,
+    'logs': Logs,
+    'stats': Stats,
+    'audit': Audit,
+    'import': Import,
+    'export': Export,
+    'backup': Backup,
+    'sync': Sync,
+    'batch': Batch,
+    'rebuild-stats': RebuildStats,
+    'completion': Completion,
+    'shell': Shell
+}
+
+
 def main():
     printer = Printer()
-    commands = {
-        'add': Add,
-        'edit': Edit,
-        'remove': Remove,
-        'show': Show,
-        'search': Search
-    }
-
-    if len(sys.argv[1:]) == 0:
-        printer.print_error(ERR_INVALID_COMMAND, exit=True)
+    args = sys.argv[1:]
+    profiler = None
 
-    args = sys.argv[2:]
+    while args and args[0].startswith('--'):
+        option, _, value = args.pop(0).partition('=')
+
+        if option == '--profile':
+            from profiler import Profiler
+            profiler = Profiler(value or None)
+
+        elif option == '--format':
+            if not value and args:
+                value = args.pop(0)
+            if value not in printer.formats:
+                printer.print_error('Format must be one of json, ndjson, tsv', exit=True)
+            printer.format = value
+
+        else:
+            printer.print_error(ERR_INVALID_COMMAND, exit=True)
+
+    if len(args) == 0:
+        printer.print_error(ERR_INVALID_COMMAND, exit=True)
 
     try:
-        command = commands[sys.argv[1]]
+        command = COMMANDS[args[0]]
     except KeyError:
         printer.print_error(ERR_INVALID_COMMAND, exit=True)
 
-    command().run(args)
-    
-    engine.dispose()
+    if profiler or not settings.ENABLE_CACHE or args[0] not in CACHED_COMMANDS:
+        cache = None
+    else:
+        from cache import RenderCache
+        cache = RenderCache(printer, args)
+
+        if cache.replay():
+            return
+
+    try:
+        with profiler.run(printer) if profiler else cache.record() if cache else nullcontext():
+            command(printer=printer).run(args[1:])
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+    if 'db' in sys.modules:
+        sys.modules['db'].engine.dispose()
         
 
 if __name__ == "__main__":
@@ -0,0 +1,601 @@
+import sys
+import json
+import shutil
+import logging
+import textwrap
+
+import settings
+
+from itertools import zip_longest, islice, chain
+from datetime import date
+from contextlib import contextmanager, nullcontext
+
+
+logging.basicConfig(format='%(message)s', level=logging.INFO)
+
+
+class Printer:
+    def __init__(self):
+        self.width = self._find_apt_value(settings.WIDTH, shutil.get_terminal_size().columns)
+        self.columns = self._find_apt_value(settings.COLUMNS.copy(), self.width)
+        self.indent = ('', 1, 'l')
+        self.gutter = ' ' * 3
+        self.margin = ' ' * 2
+        self.color_foreground = '\x1b[38;2;{};{};{}m'.format(*settings.COLOR_FOREGROUND)
+        self.color_background = '\x1b[48;2;{};{};{}m'.format(*settings.COLOR_ROW_BACKGROUND)
+        self.color_reset = '\x1b[0m'
+        self.buffer = None
+        self.capture = None
+        self.chunk_size = 1000
+        self.format = None
+        self.formats = ['json', 'ndjson', 'tsv']
+        self.json_encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+    def _parse_layout_options(self, options, locals=None):
+        layout = []
+
+        if not options:
+            return [('', 0, 'l')]
+
+        for param, option in options.items():
+            if param == 'BLANK':
+                layout.append(('', option['span'], 'l'))
+            else:
+                name = locals[param] if locals else option['name']
+                layout.append((name, option['span'], option['align']))
+
+        return layout
+  
+    def _compile_layout(self, options):
+        layout = []
+        current_index = 0
+
+        for param, option in options.items():
+            span = option['span']
+            if span <= 0:
+                continue
+
+            width = (span - 1) * 3 + sum(self.columns[current_index:current_index+span])
+            current_index += span
+            layout.append((param, width, option.get('align', 'l')))
+
+        return layout
+
+    def _find_apt_value(self, items, value):
+        apt_value = items.get('default')
+
+        for item in items:
+            if item != 'default' and value >= item:
+                apt_value = items[item]
+
+        return apt_value
+
+    def _truncate(self, string, width, align=None):
+        if len(string) > width:
+            string = f'{string[:width-3].strip()}...'
+            if align and align == 'l':
+                return string.ljust(width)
+            if align and align == 'r':
+                return string.rjust(width)
+
+        return string
+
+    def _format_item(self, string, width, align, wrap):
+        items = []
+
+        if not string:
+            return [(''.ljust(width), width, align)]
+
+        if isinstance(string, dict):
+            string = self._find_apt_value(string, width)
+
+        string = str(string)
+        strings = textwrap.wrap(string, width=width) if wrap else [self._truncate(string, width, align)]
+
+        for string in strings:
+            if align == 'l':
+                string = string.ljust(width)
+            if align == 'r':
+                string = string.rjust(width)
+            items.append((string, width, align))
+
+        return items
+
+    def _format_line(self, items, wrap=False, full_just=False, background_color='', foreground_color=''):
+        current_index = 0
+        formatted_items = []
+
+        for string, span, align in items:
+            if span <= 0:
+                continue
+
+            width = (span - 1) * 3 + sum(self.columns[current_index:current_index+span])
+            current_index += span
+
+            if isinstance(string, list):
+                ins_str = []
+                for item in string:
+                    ins_str.extend(self._format_item(item, width, align, wrap))
+                formatted_items.append(ins_str)
+            else:
+                formatted_items.append(self._format_item(string, width, align, wrap)) 
+            
+        lines = [list(field) for field in list(zip_longest(*formatted_items, fillvalue=None))]
+
+        line_strings = []
+
+        for line in lines:
+            line_fields = []
+            for j, sub_f in enumerate(line):
+                if not sub_f:
+                    width = lines[0][j][1]
+                    line_fields.append(''.ljust(width))
+                else:
+                    line_fields.append(sub_f[0])
+            line_strings.append(line_fields)
+
+        for i, line_string in enumerate(line_strings):
+            line_string = self.margin + self.gutter.join(line_string)
+
+            if full_just:
+                line_string = line_string.ljust(self.width)
+
+            if settings.ENABLE_COLOR:
+                if not foreground_color:
+                    foreground_color = self.color_foreground
+                line_string = f'{foreground_color}{background_color}{line_string}{self.color_reset}'
+
+            line_strings[i] = line_string
+        
+        return line_strings
+    
+    def _format_cell(self, string, width, align):
+        if not string:
+            return ' ' * width
+
+        string = self._truncate(str(string), width)
+
+        if align == 'r':
+            return string.rjust(width)
+
+        return string.ljust(width)
+
+    def _format_rows(self, layout, rows):
+        highlight = True
+        prefix = self.color_foreground + self.color_background
+
+        for row in rows:
+            line_string = self.margin + self.gutter.join([
+                self._format_cell(string, width, align) for string, (param, width, align) in zip(row, layout)
+            ])
+
+            if settings.ENABLE_COLOR:
+                if highlight:
+                    line_string = f'{prefix}{line_string.ljust(self.width)}{self.color_reset}'
+                else:
+                    line_string = f'{self.color_foreground}{line_string}{self.color_reset}'
+                highlight = not highlight
+
+            yield line_string
+
+    def _format_count(self, count, name):
+        string = name if count == 1 else name + 's'
+        return f'{count} {string}'
+
+    def _format_count_log(self, log_count):
+        return self._format_count(log_count, 'log')
+
+    def _format_count_book(self, book_count):
+        return self._format_count(book_count, 'book')
+
+    def _format_count_page(self, page_count):
+        return self._format_count(page_count, 'page')
+
+    def _format_count_hour(self, hour_count):
+        return self._format_count(hour_count, 'hour')
+
+    @contextmanager
+    def buffered(self):
+        if self.buffer is not None:
+            yield
+            return
+
+        self.buffer = []
+
+        try:
+            yield
+        finally:
+            line_strings, self.buffer = self.buffer, None
+            self.write(line_strings)
+
+    def write(self, line_strings):
+        if self.buffer is not None:
+            self.buffer.extend(line_strings)
+        else:
+            string = ''.join(f'{line_string}\n' for line_string in line_strings)
+            if self.capture is not None:
+                self.capture.append(string)
+            sys.stdout.write(string)
+
+    def _format_tsv_value(self, value):
+        if value is None:
+            return ''
+        return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+    def _format_records(self, fields, rows):
+        if self.format == 'tsv':
+            yield '\t'.join(fields)
+            for row in rows:
+                yield '\t'.join(map(self._format_tsv_value, row))
+
+        elif self.format == 'ndjson':
+            for row in rows:
+                yield self.json_encoder.encode(dict(zip(fields, row)))
+
+        else:
+            yield '['
+            previous = None
+            for row in rows:
+                if previous is not None:
+                    yield previous + ','
+                previous = '  ' + self.json_encoder.encode(dict(zip(fields, row)))
+            if previous is not None:
+                yield previous
+            yield ']'
+
+    def print_records(self, fields, rows):
+        lines = self._format_records(fields, rows)
+
+        for line_strings in iter(lambda: list(islice(lines, self.chunk_size)), []):
+            self.write(line_strings)
+
+    def print_line(self, items, print_method=None, new_line_before=False, new_line_after=False, **kwargs):
+        line_strings = self._format_line(items, **kwargs)
+
+        if new_line_before:
+            line_strings.insert(0, '')
+
+        if new_line_after:
+            line_strings.append('')
+
+        if not print_method:
+            self.write(line_strings)
+            return
+
+        for line_string in line_strings:
+            print_method(line_string)
+
+    def print_empty_line(self, **kwargs):
+        self.print_line([('', 1, 'l')], **kwargs)
+
+    def print_item_count(self, book_count=None, log_count=None, page_count=None, hour_count=None, **kwargs):
+        fields = []
+        log_count_string = self._format_count_log(log_count)
+        book_count_string = self._format_count_book(book_count)
+        page_count_string = self._format_count_page(page_count)
+        hour_count_string = self._format_count_hour(hour_count)
+
+        if book_count is not None:
+            fields.append(book_count_string)
+
+        if log_count is not None:
+            fields.append(log_count_string)
+
+        if page_count is not None:
+            fields.append(page_count_string)
+
+        if hour_count is not None:
+            fields.append(hour_count_string)
+
+        string = ', '.join(fields)
+        items = [self.indent, (string, 5, 'l')]
+        self.print_line(items, **kwargs)
+
+    def print_field(self, name, value, **kwargs):
+        items = [self.indent, (name, 1, 'r'), (value, 4, 'l')] 
+        self.print_line(items, wrap=True, **kwargs)
+
+    def print_action(self, action, **kwargs):
+        items = [self.indent, (action, 5, 'l')]
+        self.print_line(items, **kwargs)
+
+    def print_error(self, error, exit=False, **kwargs):
+        self.capture = None
+        items = [self.indent, (error, 5, 'l')]
+        self.print_line(items, wrap=True, print_method=logging.error, **kwargs)
+
+        if exit:
+            sys.exit(1)
+
+    def print_usage(self, usage):
+        self.print_field('Usage', usage)
+        sys.exit(1)
+
+    def print_table_headers(self, headers, **kwargs):
+        items = self._parse_layout_options(headers)
+        self.print_line(items, **kwargs)
+
+    def print_table_book(self, books, show_count=True, new_line_before=False, new_line_after=False):
+        headers = {
+                'id': {
+                'name': '', 
+                'span': 1, 
+                'align': 'l', 
+            }, 
+            'title': {
+                'name': 'Title', 
+                'span': 2, 
+                'align': 'l', 
+            }, 
+            'author': {
+                'name': 'Author', 
+                'span': 2, 
+                'align': 'l', 
+            }, 
+            'log_count': {
+                'name': '', 
+                'span': 1, 
+                'align': 'l', 
+            }
+        }
+        layout = self._compile_layout(headers)
+        total_log_count = sum(book.log_count for book in books)
+        rows = ((book.id, book.title, book.author, book.log_count) for book in books)
+
+        with self.buffered():
+            if new_line_before:
+                self.print_empty_line()
+
+            self.write(self._format_rows(layout, rows))
+            self.print_table_headers(headers)
+
+            if show_count:
+                self.print_item_count(len(books), total_log_count, new_line_before=True)
+
+            if new_line_after:
+                self.print_empty_line()
+
+    def print_table_log(self, logs, show_count=True, new_line_before=False, new_line_after=False, stream=False):
+        headers = {
+            'BLANK': {
+                'span': 1
+            },
+            'date': {
+                'name': 'Date', 
+                'span': 1, 
+                'align': 'l', 
+            }, 
+            'time': {
+                'name': 'Time', 
+                'span': 1, 
+                'align': 'l', 
+            }, 
+            'pages': {
+                'name': 'Pages', 
+                'span': 1, 
+                'align': 'l', 
+            }, 
+            'depth': {
+                'name': 'Depth', 
+                'span': 1, 
+                'align': 'r', 
+            }, 
+        }
+        layout = self._compile_layout(headers)
+        date_format = self._find_apt_value(settings.FORMAT_DATE, layout[1][1])
+
+        log_count = 0
+
+        if not stream:
+            logs.sort(key=lambda r: r.date)
+
+        rows = self._format_rows(layout, ((
+            '',
+            log.date.strftime(date_format),
+            f'{log.time_start.strftime("%H:%M")} {log.time_end.strftime("%H:%M")}',
+            f'{str(log.page_start).ljust(4)} {str(log.page_end).ljust(4)}' if log.page_start and log.page_end else '',
+            log.depth,
+        ) for log in logs))
+
+        with nullcontext() if stream else self.buffered():
+            if new_line_before:
+                self.print_empty_line()
+
+            for line_strings in iter(lambda: list(islice(rows, self.chunk_size)), []):
+                log_count += len(line_strings)
+                self.write(line_strings)
+
+            self.print_table_headers(headers)
+
+            if show_count:
+                self.print_item_count(log_count=log_count, new_line_before=True)
+
+            if new_line_after:
+                self.print_empty_line()
+    
+    def print_table_stats(self, stats, period, new_line_before=False, new_line_after=False):
+        headers = {
+            'BLANK': {
+                'span': 1
+            },
+            'period': {
+                'name': 'Period', 
+                'span': 1, 
+                'align': 'l', 
+            }, 
+            'log_count': {
+                'name': 'Logs', 
+                'span': 1, 
+                'align': 'r', 
+            }, 
+            'page_count': {
+                'name': 'Pages', 
+                'span': 1, 
+                'align': 'r', 
+            }, 
+            'hour_count': {
+                'name': 'Hours', 
+                'span': 2, 
+                'align': 'r', 
+            }, 
+        }
+        layout = self._compile_layout(headers)
+        date_format = self._find_apt_value(settings.FORMAT_DATE, layout[1][1])
+        totals = stats[0]
+
+        rows = ((
+            '',
+            date.fromisoformat(row.period).strftime(date_format) if period == 'day' else row.period,
+            row.log_count,
+            row.page_count,
+            round(row.minute_count / 60, 1),
+        ) for row in stats)
+
+        with self.buffered():
+            if new_line_before:
+                self.print_empty_line()
+
+            self.write(self._format_rows(layout, rows))
+            self.print_table_headers(headers)
+            self.print_item_count(
+                log_count=totals.total_log_count,
+                page_count=totals.total_page_count,
+                hour_count=round(totals.total_minute_count / 60, 1),
+                new_line_before=True
+            )
+
+            if new_line_after:
+                self.print_empty_line()
+
+    def print_stats(self, stats, period, empty_message):
+        if self.format:
+            fields = ('period', 'log_count', 'page_count', 'hour_count')
+            rows = ((row.period, row.log_count, row.page_count, round(row.minute_count / 60, 1)) for row in stats)
+            self.print_records(fields, rows)
+        elif not stats:
+            self.print_error(empty_message)
+        else:
+            self.print_table_stats(stats, period)
+
+    def print_table_overlap(self, overlaps, new_line_before=False, new_line_after=False):
+        headers = {
+            'BLANK': {
+                'span': 1
+            },
+            'log': {
+                'name': 'Log', 
+                'span': 2, 
+                'align': 'l', 
+            }, 
+            'overlap': {
+                'name': 'Overlaps', 
+                'span': 3, 
+                'align': 'l', 
+            }, 
+        }
+        layout = self._compile_layout(headers)
+
+        rows = ((
+            '',
+            f'{overlap.date}.{overlap.time_start.strftime("%H:%M")}',
+            f'{overlap.date}.{overlap.overlap_time_start.strftime("%H:%M")}',
+        ) for overlap in overlaps)
+
+        with self.buffered():
+            if new_line_before:
+                self.print_empty_line()
+
+            self.write(self._format_rows(layout, rows))
+            self.print_table_headers(headers)
+            self.print_action(self._format_count(len(overlaps), 'overlap'), new_line_before=True)
+
+            if new_line_after:
+                self.print_empty_line()
+
+    def print_overlaps(self, overlaps, empty_message):
+        if not overlaps:
+            self.print_action(empty_message)
+        else:
+            self.print_table_overlap(overlaps)
+
+    def print_logs(self, logs, empty_message):
+        if self.format:
+            fields = ('book_id', 'date', 'time_start', 'time_end', 'page_start', 'page_end', 'depth')
+            self.print_records(fields, logs)
+            return
+
+        logs = iter(logs)
+        log = next(logs, None)
+
+        if log is None:
+            self.print_error(empty_message)
+        else:
+            self.print_table_log(chain([log], logs), stream=True)
+
+    def print_books(self, books, empty_message):
+        if self.format:
+            self.print_records(('id', 'title', 'author', 'log_count'), books)
+        elif not books:
+            self.print_error(empty_message)
+        else:
+            self.print_table_book(books)
+        
+    def print_book_expand(self, book, new_line_before=False, new_line_after=False):
+        id = book.id
+        title = 'Unknown Book' if not book.title else book.title
+        author = 'Unknown Author' if not book.author else book.author
+
+        row1_items = [(id, 1, 'l'), (title, 5, 'l')]
+        row2_items = [self.indent, (author, 5, 'l')]
+
+        if new_line_before:
+            self.print_empty_line()
+
+        self.print_line(row1_items, wrap=True)
+        self.print_line(row2_items, wrap=True)
+
+        if new_line_after:
+            self.print_empty_line()
+
+    def print_book_info(self, book, stats, logs):
+        empty_message = 'No Logs'
+
+        if self.format:
+            self.print_logs(logs, empty_message)
+        elif not stats.log_count:
+            self.print_error(empty_message)
+            self.print_book_expand(book, new_line_before=True)
+        else:
+            hour_count = round(stats.minute_count / 60, 1)
+            self.print_table_log(logs, show_count=False, new_line_after=True, stream=True)
+            self.print_book_expand(book, new_line_after=True)
+            self.print_item_count(log_count=stats.log_count, page_count=stats.page_count, hour_count=hour_count)
+
+    def confirm_delete(self, books, log_count):
+        input_field = ''.join(self._format_line([self.indent, self.indent]) + [self.gutter])
+        log_count_string = self._format_count_log(log_count)
+        book_count_string = self._format_count_book(len(books))
+
+        if books:
+            if len(books) == 1:
+                book = next(iter(books))
+                if book.title:
+                    book_title = self._truncate(book.title, 35)
+                    text = f'\"{book_title}\"'
+                else:
+                    text = book_count_string
+            else:
+                text = book_count_string
+            if log_count:
+                text += f' and {log_count_string}'
+        else:
+            text = log_count_string
+
+        prompt = f'Delete {text}?'
+        items = [self.indent, (prompt, 5, 'l')]
+
+        self.print_line(items, wrap=True)
+
+        confirm = input(input_field)
+
+        return confirm in {'yes', 'y', 'delete'}
@@ -0,0 +1,107 @@
+import os
+import re
+import sys
+import time
+import pstats
+import cProfile
+
+from functools import partial
+from collections import Counter
+from contextlib import contextmanager
+
+
+class Profiler:
+    def __init__(self, dump_path=None):
+        self.dump_path = dump_path
+        self.profile = cProfile.Profile()
+        self.queries = []
+        self.elapsed = 0
+        self.slowest_count = 5
+        self.repeated_count = 3
+        self.statement_width = 120
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info['query_start'].pop()
+        self.queries.append((time.perf_counter() - start, statement))
+
+    def _listen(self):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _entry_time(self, stats, module, callers_from=None):
+        # time spent in a module counted where it is entered from real code outside it,
+        # so nested calls and builtins (islice, sorted, ...) aren't counted twice
+        total = 0
+
+        for (path, line, name), (cc, nc, tt, ct, callers) in stats.items():
+            if os.path.basename(path) != module:
+                continue
+
+            for (caller_path, caller_line, caller_name), (_, _, _, caller_ct) in callers.items():
+                caller_module = os.path.basename(caller_path)
+                if caller_path == '~' or caller_module == module:
+                    continue
+                if callers_from and caller_module != callers_from:
+                    continue
+                total += caller_ct
+
+        return total
+
+    def _format_statement(self, statement):
+        statement = re.sub(r'^SELECT .+? FROM ', 'SELECT ... FROM ', ' '.join(statement.split()))
+        if len(statement) > self.statement_width:
+            statement = statement[:self.statement_width - 3] + '...'
+        return statement
+
+    def _format_ms(self, seconds):
+        return f'{seconds * 1000:.1f} ms'
+
+    @contextmanager
+    def run(self, printer):
+        start = time.perf_counter()
+        self.profile.enable()
+
+        try:
+            self._listen()
+            yield
+        finally:
+            self.profile.disable()
+            self.elapsed = time.perf_counter() - start
+            self.report(printer)
+
+    def report(self, printer):
+        stats = pstats.Stats(self.profile).stats
+        db_time = self._entry_time(stats, 'db.py')
+        printer_time = self._entry_time(stats, 'printer.py') - self._entry_time(stats, 'db.py', callers_from='printer.py')
+        sql_time = sum(duration for duration, statement in self.queries)
+
+        query_count = f'{len(self.queries)} {"query" if len(self.queries) == 1 else "queries"}'
+
+        # stdout may be carrying --format records, so the report goes to stderr
+        print_method = partial(print, file=sys.stderr)
+        print_field = partial(printer.print_field, print_method=print_method)
+
+        printer.print_empty_line(print_method=print_method)
+        print_field('Total', self._format_ms(self.elapsed))
+        print_field('SQL', f'{query_count}, {self._format_ms(sql_time)}')
+        print_field('DB', self._format_ms(db_time))
+        print_field('Printer', self._format_ms(printer_time))
+        print_field('Other', self._format_ms(max(self.elapsed - db_time - printer_time, 0)))
+
+        repeated = Counter(statement for duration, statement in self.queries).most_common(self.repeated_count)
+        for statement, count in repeated:
+            if count > 1:
+                print_field('Repeated', f'{count}x {self._format_statement(statement)}')
+
+        for duration, statement in sorted(self.queries, reverse=True)[:self.slowest_count]:
+            print_field('Slowest', f'{self._format_ms(duration)} {self._format_statement(statement)}')
+
+        if self.dump_path:
+            self.profile.dump_stats(self.dump_path)
+            print_field('Profile', self.dump_path)
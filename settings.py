@@ -1,5 +1,49 @@
+import os
+
+
 DB_PATH = ''
 ENABLE_COLOR = True
+ENABLE_CACHE = True
+CACHE_DIR = '~/.cache/logger'
+CACHE_MAX_ENTRIES = 256
+BOOK_ID_RANGE = (1000, 9999)
+
+SEARCH_FUZZY_THRESHOLD = 0.3
+SEARCH_FUZZY_LIMIT = 20
+
+WRITE_RETRIES = 8
+WRITE_RETRY_DELAY = 0.01
+
+BACKUP_KEEP = 7
+BACKUP_STEP_PAGES = 1024
+
+STORAGE_PROFILE = 'safe'
+STORAGE_PROFILES = {
+    'safe': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -8000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    'bulk': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -256000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+}
 
 WIDTH = {
     'default': 58,
@@ -12,4 +56,10 @@ FORMAT_DATE = {
 }
 
 COLOR_ROW_BACKGROUND = (30, 30, 30)
-COLOR_FOREGROUND = (255, 255, 255)
\ No newline at end of file
+COLOR_FOREGROUND = (255, 255, 255)
+
+
+# the cache, backups and completion open the DB with sqlite3 to stay clear of SQLAlchemy, and
+# all of them must agree with db.py on which file that is
+def db_path():
+    return os.path.abspath(os.path.expanduser(DB_PATH) if DB_PATH else '.logger.db')
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RUN_LOGGER = """
+import sys
+import json
+import settings
+for name, value in json.loads(sys.argv[1]).items():
+    setattr(settings, name, value)
+sys.argv = ['logger.py'] + sys.argv[2:]
+import logger
+logger.main()
+"""
+
+
+def logger_argv(path, *args, **overrides):
+    overrides = {'DB_PATH': str(path), 'ENABLE_CACHE': False, 'ENABLE_COLOR': False, **overrides}
+    return [sys.executable, '-c', RUN_LOGGER, json.dumps(overrides), *args]
+
+
+@pytest.fixture
+def run_logger():
+    # logger.py in a fresh process against the DB at path, settings are overridden by keyword
+    def run(path, *args, input=None, check=True, **overrides):
+        result = subprocess.run(logger_argv(path, *args, **overrides), cwd=ROOT_DIR, capture_output=True, text=True, input=input)
+        if check:
+            assert result.returncode == 0, result.stderr + result.stdout
+        return result
+
+    return run
+
+
+@pytest.fixture
+def start_logger():
+    # the same, left running with pipes for tests that talk to it or signal it
+    processes = []
+
+    def start(path, *args, env=None, **overrides):
+        process = subprocess.Popen(logger_argv(path, *args, **overrides), cwd=ROOT_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        processes.append(process)
+        return process
+
+    yield start
+
+    for process in processes:
+        process.kill()
+        process.communicate()
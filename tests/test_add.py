@@ -0,0 +1,29 @@
+import sqlite3
+
+from contextlib import closing
+
+
+def book_ids(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return [book_id for book_id, in conn.execute('SELECT id FROM book ORDER BY id')]
+
+
+def test_add_book_fills_gaps_once_the_range_is_full(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+
+    def add_book(title, check=True):
+        return run_logger(path, 'add', 'book', title, check=check, BOOK_ID_RANGE=[1000, 1003])
+
+    for title in ('A', 'B', 'C', 'D'):
+        add_book(title)
+    run_logger(path, 'remove', '1001', '1002', input='y\n')
+
+    # the top of the range is taken, so the freed IDs are handed out from the lowest
+    add_book('E')
+    assert book_ids(path) == [1000, 1001, 1003]
+    add_book('F')
+    assert book_ids(path) == [1000, 1001, 1002, 1003]
+
+    result = add_book('G', check=False)
+    assert result.returncode != 0
+    assert 'No free Book IDs' in result.stdout + result.stderr
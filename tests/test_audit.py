@@ -0,0 +1,36 @@
+import sqlite3
+
+from contextlib import closing
+
+
+def test_add_log_rejects_overlaps(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+    run_logger(path, 'add', 'book', 'Alpha')
+    run_logger(path, 'add', 'log', '1000', '2024-03-01', '10:00-11:00')
+
+    result = run_logger(path, 'add', 'log', '1000', '2024-03-01', '10:30-11:30', check=False)
+    assert result.returncode != 0
+    assert 'Overlaps log 2024-03-01.10:00' in result.stdout + result.stderr
+
+    # touching ends don't overlap
+    run_logger(path, 'add', 'log', '1000', '2024-03-01', '11:00-12:00')
+    assert 'No Overlaps' in run_logger(path, 'audit').stdout
+
+
+def test_audit_finds_overlaps_written_by_other_clients(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+    run_logger(path, 'add', 'book', 'Alpha')
+    run_logger(path, 'add', 'log', '1000', '2024-03-01', '09:00-12:00')
+    run_logger(path, 'add', 'log', '1000', '2024-03-02', '09:00-12:00')
+
+    # 11:00 starts after 10:30 ends, only the long log it sits in flags it
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.executemany(
+            "INSERT INTO log (book_id, date, time_start, time_end) VALUES (1000, '2024-03-01', ?, ?)",
+            [('10:00:00.000000', '10:30:00.000000'), ('11:00:00.000000', '11:30:00.000000')]
+        )
+
+    output = run_logger(path, 'audit').stdout
+    assert '2 overlaps' in output
+    lines = [line.split() for line in output.splitlines() if line.strip().startswith('2024')]
+    assert lines == [['2024-03-01.09:00', '2024-03-01.10:00'], ['2024-03-01.09:00', '2024-03-01.11:00']]
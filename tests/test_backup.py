@@ -0,0 +1,28 @@
+import os
+import sys
+import sqlite3
+
+from contextlib import closing
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import settings
+import backup
+
+
+def test_snapshots_in_the_same_second_are_kept(tmp_path, monkeypatch):
+    path = str(tmp_path / 'logger.db')
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute('CREATE TABLE book (id INTEGER PRIMARY KEY)')
+
+    monkeypatch.setattr(settings, 'DB_PATH', path)
+    monkeypatch.setattr(backup, 'SNAPSHOT_FORMAT', '20240101-000000')
+    snapshots = backup.Backup(str(tmp_path / 'backups'), keep=2)
+
+    paths = [snapshots.snapshot() for _ in range(3)]
+    assert len(set(paths)) == 3
+    assert snapshots.snapshots() == paths
+
+    assert snapshots.rotate() == paths[:1]
+    assert snapshots.snapshots() == paths[1:]
@@ -0,0 +1,39 @@
+import sqlite3
+
+from contextlib import closing
+
+
+def version(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+
+def test_batch_checks_arguments_before_writing(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+    run_logger(path, 'add', 'book', 'Alpha')
+    before = version(path)
+
+    result = run_logger(path, 'batch', '-', input='add book Beta\nadd log 1000 2024-13-01 10:00-11:00\n', check=False)
+    assert result.returncode != 0
+    assert 'Line 2 is invalid' in result.stderr
+    assert version(path) == before
+
+
+def test_batch_can_use_books_it_adds(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+
+    run_logger(path, 'batch', '-', input='add book Alpha\nadd log 1000 2024-03-01 10:00-11:00\nedit 1000 Beta\n')
+
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute('SELECT title, log_count FROM book JOIN book_stats ON book_id = id').fetchall() == [('Beta', 1)]
+
+
+def test_batch_reports_database_errors(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+    run_logger(path, 'add', 'book', 'Alpha')
+
+    # passes the argument checks, the table's CHECK constraint rejects it
+    result = run_logger(path, 'batch', '-', input='add book Beta\nadd log 1000 2024-03-01 10:00-10:00\n', check=False)
+    assert result.returncode != 0
+    assert 'CHECK constraint failed' in result.stdout + result.stderr
+    assert 'Line 2 failed' in result.stdout + result.stderr
@@ -0,0 +1,28 @@
+import os
+import shutil
+
+
+def test_cache_misses_db_replaced_at_same_path(tmp_path, run_logger):
+    path, other, cache_dir = str(tmp_path / 'logger.db'), str(tmp_path / 'other.db'), str(tmp_path / 'cache')
+
+    def run(path, *args):
+        return run_logger(path, *args, ENABLE_CACHE=True, CACHE_DIR=cache_dir).stdout
+
+    # both DBs end up at the same version counter
+    run(path, 'add', 'book', 'First')
+    run(other, 'add', 'book', 'Second')
+    assert 'First' in run(path, 'show')
+
+    os.remove(path)
+    shutil.copy(other, path)
+    assert 'Second' in run(path, 'show')
+
+
+def test_cache_dir_is_bounded(tmp_path, run_logger):
+    path, cache_dir = str(tmp_path / 'logger.db'), str(tmp_path / 'cache')
+    run_logger(path, 'add', 'book', 'First')
+
+    for args in (['show'], ['show', '1000'], ['--format', 'json', 'show'], ['--format', 'tsv', 'show']):
+        run_logger(path, *args, ENABLE_CACHE=True, CACHE_DIR=cache_dir, CACHE_MAX_ENTRIES=2)
+
+    assert len(os.listdir(cache_dir)) == 2
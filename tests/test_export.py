@@ -0,0 +1,39 @@
+import sqlite3
+
+import pytest
+
+from contextlib import closing
+
+
+def rows(path):
+    with closing(sqlite3.connect(path)) as conn:
+        books = conn.execute('SELECT id, title, author FROM book ORDER BY id').fetchall()
+        logs = conn.execute('SELECT book_id, date, time_start, time_end, page_start, page_end, depth FROM log ORDER BY date').fetchall()
+        return books, logs
+
+
+@pytest.mark.parametrize('extension', ['csv', 'jsonl'])
+def test_export_then_import_round_trips(tmp_path, run_logger, extension):
+    path, other = str(tmp_path / 'logger.db'), str(tmp_path / 'other.db')
+    book_file, log_file = str(tmp_path / f'book.{extension}'), str(tmp_path / f'log.{extension}')
+
+    run_logger(path, 'add', 'book', 'Alpha, "Beta"', 'Author A')
+    run_logger(path, 'add', 'book', 'Gamma', 'Émile')
+    run_logger(path, 'add', 'log', '1000', '2024-03-01', '10:00-11:00', '1-20')
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute('UPDATE log SET depth = 3')
+    # no pages or depth, both stay NULL rather than coming back as 0 or ''
+    run_logger(path, 'add', 'log', '1001', '2024-03-02', '10:00-10:30')
+
+    run_logger(path, 'export', 'book', book_file)
+    run_logger(path, 'export', 'log', log_file)
+    run_logger(other, 'import', 'book', book_file)
+    run_logger(other, 'import', 'log', log_file)
+
+    assert rows(other) == (
+        [(1000, 'Alpha, "Beta"', 'Author A'), (1001, 'Gamma', 'Émile')],
+        [
+            (1000, '2024-03-01', '10:00:00.000000', '11:00:00.000000', 1, 20, 3),
+            (1001, '2024-03-02', '10:00:00.000000', '10:30:00.000000', None, None, None),
+        ],
+    )
@@ -0,0 +1,33 @@
+import json
+import sqlite3
+
+from datetime import date, timedelta
+from contextlib import closing
+
+
+def add_logs(path, book_id, day_count, times):
+    days = [(date(2020, 1, 1) + timedelta(days=i)).isoformat() for i in range(day_count)]
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.executemany(
+            'INSERT INTO log (book_id, date, time_start, time_end) VALUES (?, ?, ?, ?)',
+            [(book_id, day, f'{start}:00.000000', f'{end}:00.000000') for day in days for start, end in times]
+        )
+
+
+def test_logs_pages_past_page_size(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+    run_logger(path, 'add', 'book', 'Alpha')
+    run_logger(path, 'add', 'book', 'Beta')
+
+    # three logs a day, so pages of LOG_PAGE_SIZE end partway through a date
+    add_logs(path, 1000, 834, [('08:00', '09:00'), ('12:00', '13:00'), ('20:00', '21:00')])
+    add_logs(path, 1001, 834, [('10:00', '11:00')])
+
+    records = json.loads(run_logger(path, '--format', 'json', 'logs', '--book', '1000').stdout)
+    keys = [(record['date'], record['time_start']) for record in records]
+    assert len(keys) == 834 * 3
+    assert keys == sorted(set(keys))
+
+    records = json.loads(run_logger(path, '--format', 'json', 'logs', '--since', '2021-01-01').stdout)
+    assert len(records) == (834 - 366) * 4
+    assert records[0]['date'] == '2021-01-01'
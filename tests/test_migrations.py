@@ -0,0 +1,102 @@
+import os
+import sys
+import sqlite3
+import subprocess
+
+from contextlib import closing
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the schema logger.py created before migrations existed (user_version 0)
+BASELINE_SCHEMA = [
+    """CREATE TABLE book (
+        id INTEGER NOT NULL,
+        title VARCHAR,
+        author VARCHAR,
+        PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE log (
+        book_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        time_start TIME NOT NULL,
+        time_end TIME NOT NULL,
+        page_start INTEGER,
+        page_end INTEGER,
+        depth INTEGER,
+        PRIMARY KEY (date, time_start),
+        CHECK (time_start < time_end),
+        CHECK (page_start <= page_end),
+        FOREIGN KEY(book_id) REFERENCES book (id)
+    )""",
+]
+
+OPEN_DB = """
+import sys
+import settings
+settings.DB_PATH = sys.argv[1]
+import db
+print(db.SCHEMA_VERSION)
+"""
+
+
+def create_baseline_db(path):
+    with closing(sqlite3.connect(path)) as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(statement)
+
+        conn.execute("INSERT INTO book VALUES (1000, 'Alpha', 'Author A')")
+        conn.execute("INSERT INTO log VALUES (1000, '2024-01-01', '10:00:00.000000', '11:30:00.000000', 1, 20, 3)")
+        conn.execute("INSERT INTO log VALUES (1000, '2024-01-02', '23:00:00.000000', '23:45:00.000000', NULL, NULL, NULL)")
+        conn.commit()
+
+
+def open_db(path):
+    return subprocess.run([sys.executable, '-c', OPEN_DB, path], cwd=ROOT_DIR, capture_output=True, text=True)
+
+
+def test_baseline_db_upgrades(tmp_path):
+    path = str(tmp_path / 'baseline.db')
+    create_baseline_db(path)
+
+    result = open_db(path)
+    assert result.returncode == 0, result.stderr + result.stdout
+
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == int(result.stdout)
+        assert conn.execute('SELECT duration_minutes FROM log ORDER BY date').fetchall() == [(90,), (45,)]
+        assert conn.execute('SELECT book_id, log_count, page_count, minute_count FROM book_stats').fetchall() == [(1000, 2, 19, 135)]
+        assert conn.execute("SELECT title FROM book WHERE id = 1000").fetchone() == ('Alpha',)
+
+
+def test_migration_error_is_reported(tmp_path):
+    path = str(tmp_path / 'broken.db')
+    create_baseline_db(path)
+
+    # a table in the way of migration 1 must surface as a migration failure, not a bad path
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute('CREATE VIEW book_stats AS SELECT 1')
+
+    result = open_db(path)
+    assert result.returncode != 0
+    assert 'Migration to schema version 1 failed' in result.stderr
+
+
+def test_schema_is_writable_by_other_clients(tmp_path):
+    path = str(tmp_path / 'baseline.db')
+    create_baseline_db(path)
+    assert open_db(path).returncode == 0
+
+    # a plain sqlite3 connection has none of the functions db.py registers
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("INSERT INTO book (id, title, author) VALUES (1001, 'Brontë', 'Émile')")
+        conn.execute("UPDATE book SET title = 'Alpha, Beta' WHERE id = 1000")
+        conn.execute("INSERT INTO log (book_id, date, time_start, time_end) VALUES (1001, '2024-01-03', '10:00:00.000000', '10:45:00.000000')")
+        conn.commit()
+
+        trigrams = {row[0] for row in conn.execute('SELECT trigram FROM book_trigram WHERE book_id = 1001')}
+        assert {'  b', 'nte', 'te ', '  e', 'ile'} <= trigrams
+        assert conn.execute("SELECT COUNT(*) FROM book_trigram WHERE book_id = 1000 AND trigram = 'ta '").fetchone() == (1,)
+
+        assert conn.execute("SELECT duration_minutes FROM log WHERE book_id = 1001").fetchone() == (45,)
+        assert conn.execute("SELECT log_count, minute_count FROM book_stats WHERE book_id = 1001").fetchone() == (1, 45)
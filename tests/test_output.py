@@ -0,0 +1,19 @@
+import json
+
+
+def test_show_book_records_are_its_logs(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+    run_logger(path, 'add', 'book', 'Alpha')
+    run_logger(path, 'add', 'log', '1000', '2024-03-01', '10:00-11:00', '1-20')
+    run_logger(path, 'add', 'log', '1000', '2024-03-02', '10:00-10:30')
+
+    records = json.loads(run_logger(path, '--format', 'json', 'show', '1000').stdout)
+    assert [(record['date'], record['page_end']) for record in records] == [('2024-03-01', 20), ('2024-03-02', None)]
+
+
+def test_profile_keeps_records_valid(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+    run_logger(path, 'add', 'book', 'Alpha')
+
+    records = json.loads(run_logger(path, '--profile', '--format', 'json', 'show').stdout)
+    assert [record['title'] for record in records] == ['Alpha']
@@ -0,0 +1,34 @@
+import sqlite3
+
+from contextlib import closing
+
+
+def logs(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute("SELECT date, substr(time_start, 1, 5) FROM log ORDER BY date, time_start").fetchall()
+
+
+def log_count(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute('SELECT log_count FROM book_stats WHERE book_id = 1000').fetchone()[0]
+
+
+def test_remove_logs_by_glob_and_date_range(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+    run_logger(path, 'add', 'book', 'Alpha')
+    for date, time in [('2024-03-01', '10:00-11:00'), ('2024-03-01', '14:00-15:00'), ('2024-03-15', '10:00-11:00'),
+                       ('2024-04-02', '10:00-11:00'), ('2024-04-30', '10:00-11:00'), ('2024-05-01', '10:00-11:00')]:
+        run_logger(path, 'add', 'log', '1000', date, time)
+
+    # the pattern reaches into the time, only the morning log of the day matches
+    run_logger(path, 'remove', '2024-03-01.1[0-3]*', input='y\n')
+    assert logs(path) == [('2024-03-01', '14:00'), ('2024-03-15', '10:00'), ('2024-04-02', '10:00'), ('2024-04-30', '10:00'), ('2024-05-01', '10:00')]
+
+    # both ends of a range are included
+    run_logger(path, 'remove', '2024-03-15..2024-04-30', input='y\n')
+    assert logs(path) == [('2024-03-01', '14:00'), ('2024-05-01', '10:00')]
+    assert log_count(path) == 2
+
+    result = run_logger(path, 'remove', '2024-05-*', input='n\n')
+    assert 'Canceled' in result.stdout
+    assert len(logs(path)) == 2
@@ -0,0 +1,49 @@
+import os
+import time
+import select
+import signal
+import sqlite3
+
+from contextlib import closing
+
+
+def read_until(process, text, timeout=30):
+    output, deadline = '', time.monotonic() + timeout
+
+    while text not in output:
+        ready, _, _ = select.select([process.stdout], [], [], deadline - time.monotonic())
+        assert ready, output
+        output += os.read(process.stdout.fileno(), 4096).decode()
+
+    return output
+
+
+def test_shell_survives_database_errors(tmp_path, run_logger):
+    path = str(tmp_path / 'logger.db')
+    run_logger(path, 'add', 'book', 'Alpha')
+
+    lines = ['add log 1000 2024-03-01 10:00-10:00', 'add log 1000 2024-03-01 10:00-11:00', 'logs']
+    result = run_logger(path, 'shell', input='\n'.join(lines) + '\n')
+
+    assert 'CHECK constraint failed' in result.stdout + result.stderr
+    assert '1 log' in result.stdout
+
+
+def test_shell_survives_interrupted_commands(tmp_path, run_logger, start_logger):
+    path = str(tmp_path / 'logger.db')
+    run_logger(path, 'add', 'book', 'Alpha')
+
+    process = start_logger(path, 'shell', env={**os.environ, 'HOME': str(tmp_path)})
+    process.stdin.write('remove 1000\n')
+    process.stdin.flush()
+
+    # Ctrl-C at the confirmation cancels the remove and leaves the shell at its prompt
+    read_until(process, 'Delete')
+    process.send_signal(signal.SIGINT)
+
+    stdout, stderr = process.communicate('add book Beta\nexit\n', timeout=30)
+    assert process.returncode == 0, stderr
+
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute('SELECT id, title FROM book ORDER BY id').fetchall() == [(1000, 'Alpha'), (1001, 'Beta')]
+    assert os.path.exists(tmp_path / '.logger_history')
@@ -0,0 +1,63 @@
+import shutil
+import sqlite3
+
+from contextlib import closing
+
+
+def books(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute('''
+            SELECT book.title, log.date, book_stats.log_count
+            FROM book LEFT JOIN log ON log.book_id = book.id JOIN book_stats ON book_stats.book_id = book.id
+            ORDER BY book.title
+        ''').fetchall()
+
+
+def test_sync_renumbers_books_added_on_both_sides(tmp_path, run_logger):
+    laptop, desktop, phone = str(tmp_path / 'laptop.db'), str(tmp_path / 'desktop.db'), str(tmp_path / 'phone.db')
+
+    run_logger(laptop, 'add', 'book', 'Shared')
+    shutil.copy(laptop, desktop)
+
+    # both sides hand out the same next ID
+    run_logger(laptop, 'add', 'book', 'Laptop Book')
+    run_logger(laptop, 'add', 'log', '1001', '2024-03-01', '10:00-11:00')
+    run_logger(desktop, 'add', 'book', 'Desktop Book')
+    run_logger(desktop, 'add', 'log', '1001', '2024-03-02', '10:00-11:00')
+    run_logger(phone, 'add', 'book', 'Phone Book')
+
+    assert 'Renumbered Book 1001' in run_logger(laptop, 'sync', desktop).stdout
+    # the phone's 1000 collides too, the desktop learns where it went from the laptop
+    run_logger(phone, 'sync', laptop)
+    run_logger(desktop, 'sync', phone)
+    run_logger(laptop, 'sync', desktop)
+
+    expected = [
+        ('Desktop Book', '2024-03-02', 1),
+        ('Laptop Book', '2024-03-01', 1),
+        ('Phone Book', None, 0),
+        ('Shared', None, 0),
+    ]
+    for path in (laptop, desktop, phone):
+        assert books(path) == expected
+
+    with closing(sqlite3.connect(laptop)) as conn:
+        assert conn.execute('SELECT COUNT(DISTINCT id) FROM book').fetchone() == (4,)
+
+
+def test_sync_keeps_deleted_books_deleted_when_their_id_is_reused(tmp_path, run_logger):
+    laptop, desktop = str(tmp_path / 'laptop.db'), str(tmp_path / 'desktop.db')
+
+    run_logger(laptop, 'add', 'book', 'A')
+    run_logger(laptop, 'add', 'book', 'B')
+    shutil.copy(laptop, desktop)
+    run_logger(laptop, 'sync', desktop)
+
+    # the allocator hands 1001 out again
+    run_logger(laptop, 'remove', '1001', input='y\n')
+    run_logger(laptop, 'add', 'book', 'C')
+    run_logger(laptop, 'sync', desktop)
+
+    for path in (laptop, desktop):
+        with closing(sqlite3.connect(path)) as conn:
+            assert conn.execute('SELECT id, title FROM book ORDER BY id').fetchall() == [(1000, 'A'), (1001, 'C')]